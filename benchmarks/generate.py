@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Generates synthetic BSEE/BOEM data in the layouts of the real files, packaged as the same zip
+archives (and under the same URL paths) as the real downloads, together with the update pages
+the datasets read their stamps from. A scale factor of 1 is roughly the size of the real data.
+
+    python -m benchmarks.generate --scale 0.5 --seed 1 site/
+"""
+
+import os
+import random
+import typing as t
+import zipfile
+import argparse
+from datetime import date, datetime, timedelta
+from urllib.parse import urlsplit
+
+import lease
+
+LEASES = 40000
+COMPANIES = 6000
+SALES = 600
+
+AREA_CODES = ("GC", "MC", "EW", "VK", "GB", "KC", "AC", "WR", "SM", "EI", "SS", "ST", "WC", "HI")
+STATUSES = ("PROD", "UNIT", "TERMIN", "RELINQ", "EXPIR", "PRIMRY", "SOP", "SOO")
+ALIQUOTS = ("N/2", "S/2", "E/2", "W/2", "NE/4", "NW/4", "SE/4", "SW/4")
+SUFFIXES = ("Inc.", "LLC", "Company", "Corporation", "L.P.", "Ltd.", "Energy, LLC")
+
+
+def datasets() -> list[lease.ZipData]:
+    return [
+        lease.OwnerData(),
+        lease.LabData(),
+        lease.LeaseData(),
+        lease.CompanyNumberToName(),
+        lease.LeaseNumberToOperator(),
+    ]
+
+
+def site_path(site: str, url: str) -> str:
+    return os.path.join(site, *urlsplit(url).path.lstrip("/").split("/"))
+
+
+class Generator:
+    """
+    Builds one consistent set of data: every lease has lease data, an operator and at least
+    one owner and area/block, and every operator is a known company, just as the join expects.
+    Dates come from a few hundred lease sales, so there are only a few thousand distinct ones.
+    """
+
+    def __init__(self, scale: float = 1.0, seed: int = 1) -> None:
+        self.random = random.Random(seed)
+
+        self.leases = [f"G{number:05d}" for number in range(max(int(LEASES * scale), 10))]
+        self.companies = [f"{number:05d}" for number in range(max(int(COMPANIES * scale), 10))]
+        self.names = {number: self.company_name(number) for number in self.companies}
+
+        # A few companies are no longer active (and so left out of the company list the export
+        # uses); of the others, a handful operate most of the leases.
+        self.terminated = {number for number in self.companies if self.random.random() < 0.05}
+        self.operating = [number for number in self.companies if number not in self.terminated]
+        self.weights = [1 / (rank + 1) for rank in range(len(self.operating))]
+
+        self.sales = sorted(
+            date(1954, 1, 1) + timedelta(days=self.random.randrange(365 * 70)) for _ in range(SALES)
+        )
+        self.sale_numbers = {sale: number for number, sale in enumerate(self.sales)}
+        self.effective = {number: self.random.choice(self.sales) for number in self.leases}
+
+    def company_name(self, number: str) -> str:
+        words = [self.random.choice(("Gulf", "Coastal", "Deep", "Blue", "Ocean", "Shelf"))]
+        words.append(self.random.choice(("Offshore", "Petroleum", "Exploration", "Resources")))
+
+        return f"{' '.join(words)} {number} {self.random.choice(SUFFIXES)}"
+
+    def company(self) -> str:
+        return self.random.choices(self.operating, weights=self.weights)[0]
+
+    def lease_data(self) -> t.Iterator[str]:
+        for number in self.leases:
+            effective = self.effective[number]
+            term = self.random.choice((5, 5, 8, 10, 10))
+            expiration = (
+                (effective + timedelta(days=365 * term)).strftime("%Y%m%d")
+                if self.random.random() < 0.4
+                else ""
+            )
+            bid = f"{self.random.randint(1000, 99999999)}.00" if self.random.random() < 0.9 else ""
+
+            yield (
+                number.ljust(16)
+                + f"{self.sale_numbers[effective]:07d}".ljust(34)
+                + effective.strftime("%Y%m%d")
+                + f"{term:02d}"
+                + expiration.ljust(8)
+                + " " * 54
+                + bid.rjust(13)
+                + " " * 20
+            )
+
+    def area_blocks(self) -> t.Iterator[str]:
+        yield (
+            "LEASE_NUMBER,AREA_CODE,BLOCK_NUM,LEASE_STATUS_CD,LEASE_EFF_DATE,LEASE_EXPIR_DATE,"
+            "BLK_MAX_WTR_DPTH"
+        )
+
+        for number in self.leases:
+            for _ in range(self.random.choice((1, 1, 1, 2))):
+                yield ",".join(
+                    (
+                        number,
+                        self.random.choice(AREA_CODES),
+                        f"{self.random.randint(1, 999):03d}",
+                        self.random.choice(STATUSES),
+                        self.effective[number].strftime("%m/%d/%Y"),
+                        "",
+                        str(self.random.randint(5, 3000)),
+                    )
+                )
+
+    def owners(self) -> t.Iterator[str]:
+        yield "LEASE_NUMBER,BUS_ASC_NAME,ASSIGNMENT_PCT,OWNER_ALIQUOT_CD,ASSIGNMENT_APPROVAL_DT"
+
+        for number in self.leases:
+            aliquots = ["1"]
+
+            if self.random.random() < 0.1:
+                aliquots += self.random.sample(ALIQUOTS, 2)
+
+            for aliquot in aliquots:
+                owners = self.random.sample(self.companies, self.random.choice((1, 1, 2, 3)))
+                shares = [self.random.random() for _ in owners]
+
+                for owner, share in zip(owners, shares):
+                    yield ",".join(
+                        (
+                            number,
+                            f'"{self.names[owner]}"',
+                            f"{100 * share / sum(shares):.5f}",
+                            aliquot,
+                            self.effective[number].strftime("%m/%d/%Y"),
+                        )
+                    )
+
+    def company_list(self) -> t.Iterator[str]:
+        for number in self.companies:
+            name = self.names[number]
+            terminated = "19990101" if number in self.terminated else ""
+
+            # The real file splits some names over two lines as "..., " and "LLC".
+            if name.endswith(", LLC") and not terminated and self.random.random() < 0.5:
+                yield number.ljust(13) + name[: -len("LLC")]
+                yield "LLC".ljust(221)
+                continue
+
+            yield number.ljust(13) + name.ljust(100) + " " * 100 + terminated.ljust(8) + "A" * 5
+
+    def operators(self) -> t.Iterator[str]:
+        for number in self.leases:
+            start = self.effective[number]
+
+            for _ in range(self.random.choice((1, 1, 2, 3))):
+                end = start + timedelta(days=self.random.randrange(1, 365 * 10))
+
+                yield (
+                    number.ljust(7)
+                    + start.strftime("%Y%m%d")
+                    + " " * 26
+                    + (end.strftime("%Y%m%d") if self.random.random() < 0.7 else " " * 8)
+                    + self.company()
+                )
+
+                start = end
+
+    def files(self) -> dict[str, t.Callable[[], t.Iterator[str]]]:
+        return {
+            "LSETAPE.DAT": self.lease_data,
+            "mv_lease_area_block.txt": self.area_blocks,
+            "mv_lease_owners_main.txt": self.owners,
+            "compallfixed.txt": self.company_list,
+            "lseowndfixed.txt": self.operators,
+        }
+
+    def write(self, site: str, stamp: datetime | None = None) -> None:
+        """
+        Writes every archive, and the update pages, under ``site`` at the paths of their URLs.
+        """
+        stamp = datetime.now() if stamp is None else stamp
+        files = self.files()
+        pages: dict[str, list[lease.ZipData]] = dict()
+
+        for dataset in datasets():
+            path = site_path(site, dataset.url)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with zipfile.ZipFile(path, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+                with archive.open("/".join(dataset.filepath), mode="w") as member:
+                    for line in files[dataset.filepath[-1]]():
+                        member.write(f"{line}\n".encode("UTF-8"))
+
+            pages.setdefault(site_path(site, dataset.update_site), list()).append(dataset)
+
+        for path, page_datasets in pages.items():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+            with open(file=path, mode="w") as page:
+                page.write("<html><body><table>\n")
+
+                for dataset in page_datasets:
+                    cells = ["<td>" + type(dataset).__name__ + "</td>"]
+                    cells += ["<td>" + stamp.strftime(lease.TIME_FORMAT) + "</td>"] * (
+                        dataset.update_column
+                    )
+
+                    page.write(f'<tr id="{dataset.update_tag}">{"".join(cells)}</tr>\n')
+
+                page.write("</table></body></html>\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("site", help="directory to write the archives and update pages to")
+    parser.add_argument("--scale", type=float, default=1.0, help="size relative to the real data")
+    parser.add_argument("--seed", type=int, default=1)
+
+    arguments = parser.parse_args()
+
+    Generator(scale=arguments.scale, seed=arguments.seed).write(arguments.site)
+
+
+if __name__ == "__main__":
+    main()
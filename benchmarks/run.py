@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Times (and, separately, memory-profiles) every stage of the pipeline on synthetic data served
+by a local stand-in for the BSEE/BOEM sites, both stage by stage and end to end, and compares
+the results against a stored baseline.
+
+    python -m benchmarks.run                       # compare against benchmarks/baseline.json
+    python -m benchmarks.run --scale 0.1 --scale 1 --repeat 5
+    python -m benchmarks.run --save                # record the results as the new baseline
+    python -m benchmarks.run --check               # exit with 1 if any stage got slower
+
+Timings are the best of ``--repeat`` runs; peak memory comes from one more run of each stage
+under ``tracemalloc`` (which would otherwise skew the timings).
+"""
+
+import gc
+import os
+import sys
+import json
+import shutil
+import typing as t
+import argparse
+import platform
+import tempfile
+import contextlib
+import tracemalloc
+from time import perf_counter
+from datetime import datetime
+from functools import partial
+
+import dates
+import delta
+import lease
+import exports
+import storage
+from benchmarks.server import StandInServer
+from benchmarks.generate import Generator
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Differences smaller than these are noise, whatever the ratio.
+NOISE = {"seconds": 0.005, "peak_mb": 1.0}
+
+
+def clear_storage() -> None:
+    shutil.rmtree(storage.STORAGE, ignore_errors=True)
+    os.makedirs(storage.STORAGE)
+
+
+def forget(dataset: lease.ZipData) -> None:
+    """
+    Removes everything in storage for one dataset, so it has to be downloaded again.
+    """
+    name = dataset.filepath[-1]
+
+    for suffix in ("", ".time", ".http", ".snapshot", ".part", ".part.http"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(storage.path(name + suffix))
+
+
+def forget_exports() -> None:
+    for name in os.listdir(storage.STORAGE):
+        if name.startswith(("export-", "rows-", delta.MANIFEST)):
+            os.remove(storage.path(name))
+
+
+def clear_caches() -> None:
+    """
+    Empties the memoised date conversions, so every parse starts from nothing as it would in a
+    fresh process.
+    """
+    for function in vars(dates).values():
+        if hasattr(function, "cache_clear"):
+            function.cache_clear()
+
+
+class Benchmark:
+    def __init__(self, server: StandInServer, repeat: int, memory: bool) -> None:
+        self.server = server
+        self.repeat = repeat
+        self.memory = memory
+
+        self.results: dict[str, dict[str, float]] = dict()
+
+    def wrapper(self) -> lease.WebLeaseWrapper:
+        return lease.WebLeaseWrapper(
+            owner=t.cast(lease.OwnerData, self.server.localise(lease.OwnerData())),
+            area_block=t.cast(lease.LabData, self.server.localise(lease.LabData())),
+            lease_data=t.cast(lease.LeaseData, self.server.localise(lease.LeaseData())),
+            companies=t.cast(
+                lease.CompanyNumberToName, self.server.localise(lease.CompanyNumberToName())
+            ),
+            lease_operators=t.cast(
+                lease.LeaseNumberToOperator, self.server.localise(lease.LeaseNumberToOperator())
+            ),
+        )
+
+    def measure(
+        self, name: str, run: t.Callable[[], t.Any], setup: t.Callable[[], t.Any] | None
+    ) -> None:
+        timings = list()
+
+        for _ in range(self.repeat):
+            if setup is not None:
+                setup()
+
+            gc.collect()
+            started = perf_counter()
+            run()
+            timings.append(perf_counter() - started)
+
+        self.results[name] = {"seconds": min(timings)}
+
+        if self.memory:
+            if setup is not None:
+                setup()
+
+            gc.collect()
+            tracemalloc.start()
+
+            try:
+                run()
+                self.results[name]["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+
+            finally:
+                tracemalloc.stop()
+
+        print(f"  {name:<32} {format_result(self.results[name])}", flush=True)
+
+    def run(self) -> dict[str, dict[str, float]]:
+        state: dict[str, t.Any] = dict()
+
+        def cold() -> None:
+            clear_storage()
+            clear_caches()
+            lease.freshness.clear()
+            state["wrapper"] = self.wrapper()
+
+        def warm() -> None:
+            forget_exports()
+            state["wrapper"] = self.wrapper()
+
+        self.measure("end_to_end.cold", lambda: state["wrapper"].export(), cold)
+        self.measure("end_to_end.warm", lambda: state["wrapper"].export(), warm)
+
+        for name in lease.WebLeaseWrapper.dataset_names:
+            self.dataset_stages(name)
+
+        def prepared() -> None:
+            state["wrapper"] = self.wrapper()
+            state["wrapper"].prepare_data()
+
+        def joined() -> None:
+            forget_exports()
+
+            if "joined" not in state:
+                prepared()
+                state["wrapper"].prepare_csv_list(state["wrapper"].data_version(check=False))
+                state["joined"] = state["wrapper"]
+
+            state["wrapper"] = state["joined"]
+
+        self.measure("prepare_data", lambda: state["wrapper"].prepare_data(), prepared)
+        self.measure("join", lambda: state["wrapper"].join(), joined)
+        self.measure(
+            "prepare_csv_list",
+            lambda: state["wrapper"].prepare_csv_list(state["wrapper"].data_version(check=False)),
+            joined,
+        )
+
+        for export_format in exports.FORMATS:
+            self.measure(f"export.{export_format}", partial(export, state, export_format), joined)
+
+        self.measure("send_csv", lambda: state["wrapper"].send_csv(), joined)
+
+        return self.results
+
+    def dataset_stages(self, name: str) -> None:
+        wrapper = self.wrapper()
+        dataset: lease.ZipData = getattr(wrapper, name)
+        dataset.cache()
+
+        def download() -> None:
+            forget(dataset)
+
+        def load() -> None:
+            clear_caches()
+            dataset.get_local_data()
+            dataset.load_data()
+            dataset.data = list(dataset.data)
+
+        def snapshot() -> None:
+            if not hasattr(dataset, "parsed_data"):
+                load()
+                dataset.parse_data()
+
+        self.measure(f"{name}.download", dataset.get_remote_data, download)
+        self.measure(f"{name}.load", load, None)
+        self.measure(f"{name}.parse", dataset.parse_data, load)
+        self.measure(f"{name}.snapshot_save", dataset.save_snapshot, snapshot)
+        self.measure(f"{name}.snapshot_load", dataset.load_snapshot, snapshot)
+
+
+def export(state: dict[str, t.Any], name: str) -> int:
+    return sum(map(len, state["wrapper"].iter_export(name)))
+
+
+def format_result(result: dict[str, float]) -> str:
+    text = f"{result['seconds']:9.4f} s"
+
+    if "peak_mb" in result:
+        text += f" {result['peak_mb']:9.1f} MB"
+
+    return text
+
+
+def compare(
+    results: dict[str, dict[str, dict[str, float]]],
+    baseline: dict[str, dict[str, dict[str, float]]],
+    tolerance: float,
+) -> list[str]:
+    """
+    Prints how every stage compares to the baseline at the same scale, and returns the stages
+    that got slower (or used more memory) by more than ``tolerance``.
+    """
+    regressions = list()
+
+    for scale, stages in results.items():
+        if scale not in baseline:
+            print(f"No baseline at scale {scale}")
+            continue
+
+        print(f"\nScale {scale} against the baseline:")
+
+        for stage, result in stages.items():
+            before = baseline[scale].get(stage)
+
+            if before is None:
+                print(f"  {stage:<32} (new)")
+                continue
+
+            notes = list()
+
+            for metric in ("seconds", "peak_mb"):
+                if metric not in result or metric not in before or not before[metric]:
+                    continue
+
+                ratio = result[metric] / before[metric]
+                notes.append(f"{metric} x{ratio:.2f}")
+
+                if ratio > 1 + tolerance and result[metric] - before[metric] > NOISE[metric]:
+                    regressions.append(f"{scale}:{stage} {metric}")
+                    notes[-1] += " SLOWER" if metric == "seconds" else " LARGER"
+
+            print(f"  {stage:<32} {', '.join(notes)}")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--scale", type=float, action="append", help="default 0.25; repeatable")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--output", help="also write the results to this JSON file")
+    parser.add_argument("--save", action="store_true", help="save the results as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit with 1 on any regression")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+
+    arguments = parser.parse_args()
+
+    results: dict[str, dict[str, dict[str, float]]] = dict()
+    directory = tempfile.mkdtemp(prefix="weblease-benchmark-")
+    default_storage = storage.STORAGE
+
+    try:
+        for scale in arguments.scale or [0.25]:
+            site = os.path.join(directory, f"site-{scale:g}")
+            storage.STORAGE = os.path.join(directory, f"storage-{scale:g}")
+
+            print(f"Scale {scale:g}: generating data", flush=True)
+            Generator(scale=scale, seed=arguments.seed).write(site)
+
+            with StandInServer(site=site) as server:
+                benchmark = Benchmark(
+                    server, repeat=arguments.repeat, memory=not arguments.no_memory
+                )
+                results[f"{scale:g}"] = benchmark.run()
+
+    finally:
+        storage.STORAGE = default_storage
+        shutil.rmtree(directory, ignore_errors=True)
+
+    document = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "seed": arguments.seed,
+            "repeat": arguments.repeat,
+        },
+        "results": results,
+    }
+
+    if arguments.output:
+        with open(file=arguments.output, mode="w") as output_file:
+            json.dump(document, output_file, indent=2)
+
+    regressions: list[str] = list()
+
+    try:
+        with open(file=arguments.baseline, mode="r") as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compare(results, baseline["results"], arguments.tolerance)
+
+    except FileNotFoundError:
+        print(f"\nNo baseline at {arguments.baseline}; run with --save to record one.")
+
+    if arguments.save:
+        with open(file=arguments.baseline, mode="w") as baseline_file:
+            json.dump(document, baseline_file, indent=2)
+
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+
+        if arguments.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+A local stand-in for the BSEE/BOEM sites, serving a directory written by
+``benchmarks.generate`` so the whole pipeline, downloads included, can run offline.
+
+    python -m benchmarks.server --port 8000 site/
+"""
+
+import os
+import re
+import typing as t
+import argparse
+from http import HTTPStatus
+from functools import partial
+from threading import Thread
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from urllib.parse import urlsplit, urlunsplit
+
+import lease
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    """
+    Also answers a ``Range`` request for the rest of a file from an offset, as long as the
+    ``If-Range`` date (if any) still matches the file, so resumed downloads can be exercised
+    against the stand-in too. Anything else gets the whole file, as the server is allowed to do.
+    """
+
+    def send_head(self) -> t.Any:
+        path = self.translate_path(self.path)
+        ranged = re.fullmatch(r"bytes=(\d+)-", self.headers.get("Range", ""))
+
+        if ranged is None or "If-Modified-Since" in self.headers or not os.path.isfile(path):
+            return super().send_head()
+
+        size = os.path.getsize(path)
+        last_modified = self.date_time_string(int(os.path.getmtime(path)))
+        start = int(ranged[1])
+
+        if self.headers.get("If-Range", last_modified) != last_modified:
+            return super().send_head()
+
+        if start >= size:
+            self.send_response(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+            return None
+
+        part = open(path, "rb")  # pylint: disable=consider-using-with
+        part.seek(start)
+
+        self.send_response(HTTPStatus.PARTIAL_CONTENT)
+        self.send_header("Content-type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{size - 1}/{size}")
+        self.send_header("Content-Length", str(size - start))
+        self.send_header("Last-Modified", last_modified)
+        self.end_headers()
+
+        return part
+
+    def log_message(self, format: str, *args: t.Any) -> None:  # pylint: disable=redefined-builtin
+        pass
+
+
+class StandInServer:
+    """
+    Serves ``site`` on a local port from a background thread; ``localise`` points a dataset's
+    archive and update page URLs at it instead of the real sites.
+    """
+
+    def __init__(self, site: str, port: int = 0) -> None:
+        self.server = ThreadingHTTPServer(
+            ("127.0.0.1", port), partial(QuietHandler, directory=site)
+        )
+        self.thread = Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def address(self) -> str:
+        host, port = self.server.server_address[:2]
+
+        return f"{host!s}:{port}"
+
+    def url(self, url: str) -> str:
+        return urlunsplit(urlsplit(url)._replace(scheme="http", netloc=self.address))
+
+    def localise(self, dataset: lease.ZipData) -> lease.ZipData:
+        dataset.url = self.url(dataset.url)
+        dataset.update_site = self.url(dataset.update_site)
+
+        return dataset
+
+    def __enter__(self) -> "StandInServer":
+        self.thread.start()
+
+        return self
+
+    def __exit__(self, *args: t.Any) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("site", help="directory written by benchmarks.generate")
+    parser.add_argument("--port", type=int, default=8000)
+
+    arguments = parser.parse_args()
+
+    with StandInServer(site=arguments.site, port=arguments.port) as server:
+        print(f"Serving {arguments.site} on http://{server.address}/")
+        server.thread.join()
+
+
+if __name__ == "__main__":
+    main()
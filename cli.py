@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Refreshes the cached datasets and writes the joined export from the command line, without
+Flask, for cron jobs and containers that only need the file.
+
+    python cli.py refresh                     # fetch whatever has expired, rebuild the export
+    python cli.py refresh --force             # check BSEE now, however fresh the local copies
+    python cli.py export -f xlsx -o leases.xlsx
+    python cli.py export --gzip --timings > leases.csv.gz
+    python cli.py export --production --production-years 2015-2018 -o leases.csv
+
+Flask is never imported, the pipeline only once a command runs, and BeautifulSoup only once
+an update page actually has to be read.
+"""
+
+import os
+import sys
+import shutil
+import typing as t
+import argparse
+from time import monotonic
+
+import exports
+
+if t.TYPE_CHECKING:
+    import lease
+
+# XLSX and the columnar format are compressed already.
+COMPRESSIBLE = ("csv", "ndjson")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def wrapper(arguments: argparse.Namespace) -> "lease.WebLeaseWrapper":
+    import lease  # pylint: disable=import-outside-toplevel
+
+    return lease.WebLeaseWrapper(
+        lease.OwnerData(),
+        lease.LabData(),
+        lease.LeaseData(calendar_terms=arguments.calendar_terms),
+        lease.CompanyNumberToName(),
+        lease.LeaseNumberToOperator(),
+        workers=arguments.workers,
+        timeout=arguments.timeout,
+    )
+
+
+def refresh(arguments: argparse.Namespace) -> int:
+    """
+    Brings every dataset up to date (downloading only what has changed) and rebuilds the CSV
+    export, so the web app and later exports start from a warm cache.
+    """
+    w = wrapper(arguments)
+
+    for dataset in w.datasets():
+        dataset.cache()
+
+        if arguments.force and dataset.location == "local":
+            dataset.location = "remote"
+            dataset.update = dataset.last_update()
+
+    w.prepare_data()
+    cached = w.rebuild_export()
+
+    for name in w.dataset_names:
+        dataset = getattr(w, name)
+        print(f"{name:<16} {dataset.location:<7} {dataset.update}")
+
+    print(f"version          {cached.version}")
+
+    return 0
+
+
+def export(arguments: argparse.Namespace) -> int:
+    """
+    Writes the export in any of the formats to a file or to stdout, from the cached copy for
+    the current version of the data where there is one.
+    """
+    w = wrapper(arguments)
+
+    if arguments.production:
+        return export_production(arguments, w)
+
+    cached = w.export()
+
+    if arguments.format != "csv":
+        cached = w.formatted_export(cached, name=arguments.format)
+
+    compressed = arguments.gzip and arguments.format in COMPRESSIBLE
+
+    # Only the CSV is kept pre-compressed; NDJSON is compressed as it is copied out.
+    precompressed = compressed and arguments.format == "csv"
+    path = cached.path(
+        compressed=precompressed, extension=exports.FORMATS[arguments.format].extension
+    )
+
+    with open(file=path, mode="rb") as export_file:
+        if arguments.output in (None, "-"):
+            copy(export_file, sys.stdout.buffer, compressed and not precompressed)
+
+        else:
+            with open(file=arguments.output, mode="wb") as output_file:
+                copy(export_file, output_file, compressed and not precompressed)
+
+    print(f"Exported version {cached.version}", file=sys.stderr)
+
+    return 0
+
+
+def export_production(arguments: argparse.Namespace, w: "lease.WebLeaseWrapper") -> int:
+    """
+    Writes the export with each lease's cumulative production added, straight from the joined
+    rows; it is never cached, as the production data changes more often than the leases do.
+    """
+    import production  # pylint: disable=import-outside-toplevel
+
+    index = w.leases()
+    rollups = production.Production(
+        years=production.parse_years(arguments.production_years), workers=arguments.workers
+    ).current()
+
+    chunks = w.iter_export(
+        name=arguments.format,
+        rows=production.with_production(index.rows(), rollups),
+        compress=arguments.gzip and arguments.format in COMPRESSIBLE,
+        header=[*w.header_row, *rollups.export_header()],
+        types=[*w.column_types, *production.EXPORT_TYPES],
+    )
+
+    if arguments.output in (None, "-"):
+        sys.stdout.buffer.writelines(chunks)
+
+    else:
+        with open(file=arguments.output, mode="wb") as output_file:
+            output_file.writelines(chunks)
+
+    print(f"Exported version {index.version} with production {rollups.version}", file=sys.stderr)
+
+    return 0
+
+
+def copy(source: t.IO[bytes], target: t.IO[bytes], compress: bool) -> None:
+    if not compress:
+        shutil.copyfileobj(source, target, CHUNK_SIZE)
+        return
+
+    import gzip  # pylint: disable=import-outside-toplevel
+
+    with gzip.GzipFile(fileobj=target, mode="wb", mtime=0) as gzip_file:
+        shutil.copyfileobj(source, gzip_file, CHUNK_SIZE)
+
+
+def report(seconds: float) -> None:
+    """
+    Prints how long each stage took (and how often it ran) to stderr.
+    """
+    import metrics  # pylint: disable=import-outside-toplevel
+
+    print("\nStage timings:", file=sys.stderr)
+
+    for (component, stage), (count, total) in sorted(metrics.registry.durations().items()):
+        print(f"  {component:<22} {stage:<14} {count:>3} x {total:9.4f} s", file=sys.stderr)
+
+    print(f"  {'total':<37} {seconds:15.4f} s", file=sys.stderr)
+    print(f"  {'peak memory':<37} {metrics.peak_rss() / 2**20:13.1f} MB", file=sys.stderr)
+
+
+def parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--storage", help="storage directory (default: ./storage)")
+    common.add_argument("--workers", type=int, default=5, help="datasets prepared at once")
+    common.add_argument("--timeout", type=float, help="seconds allowed per dataset")
+    common.add_argument(
+        "--calendar-terms",
+        action="store_true",
+        default=os.environ.get("WEBLEASE_CALENDAR_TERMS") == "1",
+        help="compute expirations with calendar years",
+    )
+    common.add_argument("--timings", action="store_true", help="report stage timings on stderr")
+    common.add_argument("--verbose", action="store_true", help="log every stage as JSON")
+
+    main_parser = argparse.ArgumentParser(
+        description=__doc__.split("\n\n")[0].strip(),
+        epilog=__doc__.split("\n\n")[1],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = main_parser.add_subparsers(dest="command", required=True)
+
+    refresh_parser = commands.add_parser(
+        "refresh", parents=[common], help="update the datasets and rebuild the export"
+    )
+    refresh_parser.add_argument("--force", action="store_true", help="ignore the local expiry")
+    refresh_parser.set_defaults(run=refresh)
+
+    export_parser = commands.add_parser(
+        "export", parents=[common], help="write the export to a file or stdout"
+    )
+    export_parser.add_argument("-f", "--format", choices=exports.FORMATS, default="csv")
+    export_parser.add_argument("-o", "--output", help="file to write to (default: stdout)")
+    export_parser.add_argument("--gzip", action="store_true", help="compress CSV or NDJSON")
+    export_parser.add_argument(
+        "--production", action="store_true", help="add each lease's cumulative production"
+    )
+    export_parser.add_argument(
+        "--production-years",
+        default=os.environ.get("WEBLEASE_PRODUCTION_YEARS", ""),
+        help="closed years of production to include besides the current one, e.g. 2015-2018 "
+        "(default: all of them)",
+    )
+    export_parser.set_defaults(run=export)
+
+    return main_parser
+
+
+def main(argv: list[str] | None = None) -> int:
+    arguments = parser().parse_args(argv)
+
+    if arguments.storage is not None:
+        import storage  # pylint: disable=import-outside-toplevel
+
+        storage.STORAGE = arguments.storage
+        os.makedirs(storage.STORAGE, exist_ok=True)
+
+    if arguments.verbose:
+        import logging  # pylint: disable=import-outside-toplevel
+
+        logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    import lease  # pylint: disable=import-outside-toplevel
+
+    started = monotonic()
+
+    try:
+        status: int = arguments.run(arguments)
+
+    except lease.WebLeaseException as error:
+        print(f"{parser().prog}: {error}", file=sys.stderr)
+        return 1
+
+    if arguments.timings:
+        report(monotonic() - started)
+
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import math
+import pickle
+import typing as t
+from array import array
+from collections.abc import Mapping
+
+NULLS = {"b": -(2**7), "h": -(2**15), "i": -(2**31), "q": -(2**63)}
+
+
+class Column:
+    """
+    A single typed column. Numbers are kept in an ``array`` of ``typecode``, with ``null``
+    stored as a sentinel (NaN for floats, the smallest value otherwise); strings (when no
+    ``typecode`` is given) are dictionary encoded, so each distinct value is only held once.
+
+    The values are pickled out of band, so a snapshot loaded from storage keeps them as a view
+    of its memory-mapped file rather than as a copy of its own.
+    """
+
+    def __init__(self, name: str, typecode: str | None = None, null: t.Any = None) -> None:
+        self.name = name
+        self.typecode = typecode
+        self.null = null
+
+        self.values = array(typecode or "i")
+        self.strings: list[str] = list()
+        self.codes: dict[str, int] = dict()
+
+        self.sentinel: float | int | None = None
+
+        if typecode is not None:
+            self.sentinel = math.nan if typecode in "fd" else NULLS[typecode]
+
+    def __getstate__(self) -> dict[str, t.Any]:
+        return self.__dict__ | {"values": pickle.PickleBuffer(self.values)}
+
+    def __setstate__(self, state: dict[str, t.Any]) -> None:
+        self.__dict__.update(state)
+        self.values = shared(state["values"], self.typecode or "i")
+
+    def extend(self, values: t.Sequence[t.Any]) -> None:
+        if self.typecode is None:
+            codes, strings = self.codes, self.strings
+
+            for value in values:
+                if value not in codes:
+                    codes[value] = len(strings)
+                    strings.append(value)
+
+            self.values.extend(codes[value] for value in values)
+
+        elif self.null is not None:
+            sentinel = t.cast(int, self.sentinel)
+
+            self.values.extend(sentinel if value == self.null else value for value in values)
+
+        else:
+            self.values.extend(values)
+
+    def freeze(self) -> None:
+        """
+        The reverse lookup is only needed while the column is being built.
+        """
+        self.codes = dict()
+
+    def __getitem__(self, index: int) -> t.Any:
+        value = self.values[index]
+
+        if self.typecode is None:
+            return self.strings[value]
+
+        if self.null is not None and (value == self.sentinel or value != value):
+            return self.null
+
+        return value
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def slice(self, start: int, stop: int) -> list[t.Any]:
+        values = self.values[start:stop]
+
+        if self.typecode is None:
+            return [self.strings[value] for value in values]
+
+        if self.null is not None:
+            return [
+                self.null if value == self.sentinel or value != value else value for value in values
+            ]
+
+        return values.tolist()
+
+    def nbytes(self) -> int:
+        return (
+            memoryview(self.values).nbytes
+            + sys.getsizeof(self.strings)
+            + sum(sys.getsizeof(string) for string in self.strings)
+        )
+
+
+class Row:
+    """
+    A read-only view of one row of a Table, which behaves like the list it replaces: it can be
+    unpacked, indexed by position, or indexed by column name.
+    """
+
+    __slots__ = ("table", "index")
+
+    def __init__(self, table: "Table", index: int) -> None:
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, item: int | str) -> t.Any:
+        if isinstance(item, str):
+            return self.table.names[item][self.index]
+
+        return self.table.columns[item][self.index]
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        return (column[self.index] for column in self.table.columns)
+
+    def __len__(self) -> int:
+        return len(self.table.columns)
+
+    def __eq__(self, other: object) -> bool:
+        try:
+            return list(self) == list(t.cast(t.Iterable[t.Any], other))
+
+        except TypeError:
+            return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(tuple(self))
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class Table(Mapping[str, t.Any]):
+    """
+    Rows of typed columns grouped by key, with each key's rows stored next to each other. Looking
+    up a key gives a list of Row views or, for a ``unique`` table, the single Row for that key;
+    either way the same lookups as the dicts of lists these tables replace.
+    """
+
+    def __init__(self, *columns: Column, unique: bool = False) -> None:
+        self.columns = columns
+        self.names = {column.name: column for column in columns}
+        self.unique = unique
+
+        self.index: dict[str, int] = dict()
+        self.offsets = array("I", [0])
+
+    def __getstate__(self) -> dict[str, t.Any]:
+        return self.__dict__ | {"offsets": pickle.PickleBuffer(self.offsets)}
+
+    def __setstate__(self, state: dict[str, t.Any]) -> None:
+        self.__dict__.update(state)
+        self.offsets = shared(state["offsets"], "I")
+
+    @classmethod
+    def from_groups(
+        cls,
+        groups: t.Mapping[str, t.Iterable[t.Sequence[t.Any]]],
+        *columns: Column,
+        unique: bool = False,
+    ) -> "Table":
+        table = cls(*columns, unique=unique)
+        buffer: list[t.Sequence[t.Any]] = list()
+
+        for key, rows in groups.items():
+            buffer.extend(rows)
+
+            table.index[key] = len(table.index)
+            table.offsets.append(len(buffer))
+
+        for position, column in enumerate(columns):
+            column.extend([row[position] for row in buffer])
+            column.freeze()
+
+        return table
+
+    def __getitem__(self, key: str) -> t.Any:
+        group = self.index[key]
+
+        if self.unique:
+            return Row(self, self.offsets[group])
+
+        return [Row(self, index) for index in range(self.offsets[group], self.offsets[group + 1])]
+
+    def span(self, key: str) -> tuple[int, int]:
+        group = self.index[key]
+
+        return self.offsets[group], self.offsets[group + 1]
+
+    def rows(self, key: str) -> list[tuple[t.Any, ...]]:
+        """
+        Decodes every row for ``key`` into plain tuples in one go, which is much quicker than
+        going through a Row view for each of them.
+        """
+        start, stop = self.span(key)
+
+        return list(zip(*(column.slice(start, stop) for column in self.columns)))
+
+    def decode(self) -> list[tuple[t.Any, ...]]:
+        """
+        Decodes the whole table into plain tuples, in storage order, for callers that will visit
+        most of its rows anyway; ``span`` gives the positions of each key's rows in that list.
+        """
+        return list(zip(*(column.slice(0, len(column)) for column in self.columns)))
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.index
+
+    def __iter__(self) -> t.Iterator[str]:
+        return iter(self.index)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def nbytes(self) -> int:
+        return (
+            sum(column.nbytes() for column in self.columns)
+            + sys.getsizeof(self.index)
+            + sum(sys.getsizeof(key) for key in self.index)
+            + memoryview(self.offsets).nbytes
+        )
+
+
+def shared(buffer: t.Any, typecode: str) -> t.Any:
+    """
+    The typed values of an unpickled buffer: a read-only view of the snapshot file when it was
+    pickled out of band (see ``storage.save_snapshot``), or of a copy when it was not.
+    """
+    return memoryview(buffer).cast("B").cast(typecode)  # type: ignore[call-overload]
+
+
+def sizeof(value: t.Any, seen: set[int] | None = None) -> int:
+    """
+    Approximates the memory held by ``value`` and everything it refers to, counting shared
+    objects (such as interned strings) only once.
+    """
+    seen = set() if seen is None else seen
+
+    if id(value) in seen:
+        return 0
+
+    seen.add(id(value))
+
+    if isinstance(value, (Table, Column)):
+        return value.nbytes()
+
+    size = sys.getsizeof(value)
+
+    if isinstance(value, dict):
+        size += sum(sizeof(key, seen) + sizeof(item, seen) for key, item in value.items())
+
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(sizeof(item, seen) for item in value)
+
+    return size
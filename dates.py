@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from datetime import date, timedelta
+from functools import lru_cache
+
+# The source files only hold a few thousand distinct dates between them, so every conversion
+# below is memoised on its input and the parsing and formatting happen once per distinct value
+# rather than once per row.
+
+
+@lru_cache(maxsize=None)
+def parse(value: str) -> date:
+    """
+    Parses a ``YYYYMMDD`` string arithmetically, which is much quicker than ``strptime``.
+    Raises ``ValueError`` for anything that isn't a valid date, just as ``strptime`` would.
+    """
+    if len(value) != 8 or not value.isdigit():
+        raise ValueError(f"{value!r} is not a YYYYMMDD date")
+
+    year, month_day = divmod(int(value), 10000)
+    month, day = divmod(month_day, 100)
+
+    return date(year, month, day)
+
+
+@lru_cache(maxsize=None)
+def add_years(start: date, years: int, calendar: bool = False) -> date:
+    """
+    Returns the date ``years`` after ``start``. By default each year counts as 365 days, which
+    is how the export has always approximated lease terms; with ``calendar`` the result falls on
+    the same day of the month instead, with the 29th of February moving to the 28th.
+    """
+    if not calendar:
+        return start + timedelta(days=365 * years)
+
+    try:
+        return start.replace(year=start.year + years)
+
+    except ValueError:
+        return start.replace(year=start.year + years, day=28)
+
+
+@lru_cache(maxsize=None)
+def output(day: date) -> str:
+    """
+    Formats ``day`` as the export's ``MM/DD/YYYY``.
+    """
+    return f"{day.month:02d}/{day.day:02d}/{day.year:04d}"
+
+
+@lru_cache(maxsize=None)
+def reformat(value: str) -> str:
+    """
+    Converts a ``YYYYMMDD`` string into the export's ``MM/DD/YYYY`` format.
+    """
+    return output(parse(value))
+
+
+@lru_cache(maxsize=None)
+def expiration(effective: str, term: str, calendar: bool = False) -> str:
+    """
+    The ``MM/DD/YYYY`` expiry of a lease taking effect on ``effective`` (``YYYYMMDD``) with a
+    primary term of ``term`` years.
+    """
+    return output(add_years(parse(effective), int(term), calendar))
+
+
+@lru_cache(maxsize=None)
+def parse_output(value: str) -> date:
+    """
+    Parses a date in the export's ``MM/DD/YYYY`` format.
+    """
+    month, day, year = value.split("/")
+
+    return date(int(year), int(month), int(day))
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import typing as t
+import hashlib
+import contextlib
+from datetime import datetime
+
+import storage
+
+# How many versions of the joined rows are kept around to diff against.
+KEEP_VERSIONS = 14
+
+MANIFEST = "versions.json"
+
+Key = tuple[str, str, str, int]
+Snapshot = dict[Key, tuple[bytes, tuple[t.Any, ...]]]
+
+
+def digest(row: t.Sequence[t.Any]) -> bytes:
+    return hashlib.blake2b(repr(tuple(row)).encode(), digest_size=16).digest()
+
+
+def snapshot(
+    leases: t.Mapping[str, t.Sequence[t.Sequence[t.Any]]],
+    aliquots: t.Mapping[str, str],
+    block: int,
+) -> Snapshot:
+    """
+    Hashes every joined row under its lease number, aliquot and area/block (plus how many times
+    that same area/block has already come up for the lease, so repeated blocks stay distinct).
+    """
+    rows: Snapshot = dict()
+
+    for lease, lease_rows in leases.items():
+        seen: dict[str, int] = dict()
+
+        for row in lease_rows:
+            occurrence = seen[row[block]] = seen.get(row[block], -1) + 1
+
+            rows[(lease, aliquots.get(lease, ""), row[block], occurrence)] = (
+                digest(row),
+                tuple(row),
+            )
+
+    return rows
+
+
+def name(version: str) -> str:
+    return f"rows-{version}.snapshot"
+
+
+def versions() -> list[dict[str, str]]:
+    """
+    The versions with saved rows, oldest first, each with the time it was first saved.
+    """
+    try:
+        with open(file=storage.path(MANIFEST), mode="r") as manifest_file:
+            return list(json.load(manifest_file))
+
+    except (OSError, ValueError):
+        return list()
+
+
+def saved(version: str) -> bool:
+    return any(entry["version"] == version for entry in versions())
+
+
+def save(version: str, rows: Snapshot) -> None:
+    """
+    Saves the rows of ``version`` (unless they already have been) and forgets all but the
+    latest ``KEEP_VERSIONS`` versions.
+    """
+    with storage.lock("versions"):
+        known = versions()
+
+        if any(entry["version"] == version for entry in known):
+            return
+
+        storage.save_snapshot(name(version), version, rows)
+
+        known.append({"version": version, "created": datetime.now().isoformat()})
+        known, expired = known[-KEEP_VERSIONS:], known[:-KEEP_VERSIONS]
+
+        with storage.atomic_write(MANIFEST, mode="w") as manifest_file:
+            json.dump(known, manifest_file)
+
+        for entry in expired:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(storage.path(name(entry["version"])))
+
+
+def load(version: str) -> Snapshot | None:
+    return t.cast(Snapshot | None, storage.load_snapshot(name(version), version))
+
+
+def resolve(since: str) -> str | None:
+    """
+    Finds the saved version a client last saw, given either that version itself or a point in
+    time (ISO 8601), in which case it is the latest version saved at or before that time. A
+    time with an offset (or ``Z``) is compared in local time, which is what versions are saved
+    with.
+    """
+    known = versions()
+
+    for entry in known:
+        if entry["version"] == since:
+            return entry["version"]
+
+    try:
+        # Python 3.10 cannot read "Z" for UTC
+        point = datetime.fromisoformat(since[:-1] + "+00:00" if since.endswith("Z") else since)
+
+    except ValueError:
+        return None
+
+    if point.tzinfo is not None:
+        point = point.astimezone().replace(tzinfo=None)
+
+    earlier = [entry for entry in known if datetime.fromisoformat(entry["created"]) <= point]
+
+    return earlier[-1]["version"] if earlier else None
+
+
+def diff(old: Snapshot, new: Snapshot) -> t.Iterator[tuple[str, tuple[t.Any, ...]]]:
+    """
+    Yields ``("added", row)``, ``("changed", row)`` and ``("removed", row)`` for every row that
+    differs between the two snapshots; removed rows are given as they were in ``old``.
+    """
+    for key, (row_digest, row) in new.items():
+        previous = old.get(key)
+
+        if previous is None:
+            yield "added", row
+
+        elif previous[0] != row_digest:
+            yield "changed", row
+
+    for key, (_, row) in old.items():
+        if key not in new:
+            yield "removed", row
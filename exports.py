@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import abc
+import csv
+import sys
+import json
+import math
+import struct
+import typing as t
+import zipfile
+from io import StringIO
+from array import array
+from datetime import date
+from xml.sax.saxutils import escape
+
+import dates
+from columnar import NULLS
+
+CHUNK_SIZE = 64 * 1024
+
+# Values that stand for "no value" in the joined rows; typed formats write them as nulls.
+NULL_VALUES = ("N/A", "")
+
+EPOCH = date(1970, 1, 1)
+EXCEL_EPOCH = date(1899, 12, 30)
+
+
+def convert(kind: str, value: t.Any) -> t.Any:
+    """
+    Converts a joined row value to its ``kind`` ("str", "int", "float" or "date"), with
+    ``None`` for missing values; dates that cannot be read are treated as missing too.
+    """
+    if kind == "str":
+        return value
+
+    if value in NULL_VALUES:
+        return None
+
+    if kind == "int":
+        return int(value)
+
+    if kind == "float":
+        return float(value)
+
+    try:
+        # Some of the BSEE files add a (meaningless) time to their dates.
+        return dates.parse_output(str(value).split()[0])
+
+    except (ValueError, IndexError):
+        return None
+
+
+class ExportFormat(abc.ABC):
+    """
+    One way of writing the joined rows. ``write`` yields the encoded export in chunks as it
+    goes, so no format ever has to hold the whole of it in memory.
+    """
+
+    name: str
+    extension: str
+    mimetype: str
+
+    @abc.abstractmethod
+    def write(
+        self, header: t.Sequence[str], types: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]
+    ) -> t.Iterator[bytes]:
+        pass
+
+
+class CsvExport(ExportFormat):
+    name = "csv"
+    extension = "csv"
+    mimetype = "text/csv"
+
+    def write(
+        self, header: t.Sequence[str], types: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]
+    ) -> t.Iterator[bytes]:
+        with StringIO() as memory_file:
+            memory_csv = csv.writer(memory_file, dialect="excel")
+            memory_csv.writerow(header)
+
+            for row in rows:
+                memory_csv.writerow(row)
+
+                if memory_file.tell() >= CHUNK_SIZE:
+                    yield memory_file.getvalue().encode("UTF-8")
+                    memory_file.seek(0)
+                    memory_file.truncate()
+
+            yield memory_file.getvalue().encode("UTF-8")
+
+
+class NdjsonExport(ExportFormat):
+    """
+    One JSON object per line, with numbers as numbers, dates as ISO 8601 strings and missing
+    values as ``null``.
+    """
+
+    name = "ndjson"
+    extension = "ndjson"
+    mimetype = "application/x-ndjson"
+
+    def write(
+        self, header: t.Sequence[str], types: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]
+    ) -> t.Iterator[bytes]:
+        lines: list[str] = list()
+        size = 0
+
+        for row in rows:
+            record = {
+                name: value.isoformat() if isinstance(value, date) else value
+                for name, value in zip(header, map(convert, types, row))
+            }
+
+            lines.append(json.dumps(record) + "\n")
+            size += len(lines[-1])
+
+            if size >= CHUNK_SIZE:
+                yield "".join(lines).encode("UTF-8")
+                lines, size = list(), 0
+
+        yield "".join(lines).encode("UTF-8")
+
+
+class ChunkWriter:
+    """
+    A write-only file that collects whatever is written to it until it is drained, which lets
+    ``zipfile`` stream an archive out in pieces (it falls back to data descriptors for any file
+    it cannot seek in).
+    """
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = list()
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = list()
+
+        return data
+
+
+class XlsxExport(ExportFormat):
+    """
+    A single sheet Excel workbook. Strings are written inline (rather than to a shared strings
+    table) so rows can go out as soon as they are written; numbers are numbers and dates are
+    real Excel dates.
+    """
+
+    name = "xlsx"
+    extension = "xlsx"
+    mimetype = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" '
+            'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/'
+            'vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            "</Types>"
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/officeDocument" Target="xl/workbook.xml"/>'
+            "</Relationships>"
+        ),
+        "xl/workbook.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            '<sheets><sheet name="Leases" sheetId="1" r:id="rId1"/></sheets>'
+            "</workbook>"
+        ),
+        "xl/_rels/workbook.xml.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+            '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/'
+            'relationships/styles" Target="styles.xml"/>'
+            "</Relationships>"
+        ),
+        # Style 1 is the built-in m/d/yyyy date format.
+        "xl/styles.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border/></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+            "</cellStyleXfs>"
+            '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+            "</cellXfs>"
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            "</styleSheet>"
+        ),
+    }
+
+    # Characters XML 1.0 does not allow at all, even escaped.
+    illegal = dict.fromkeys(code for code in range(32) if chr(code) not in "\t\n\r")
+
+    def cell(self, value: t.Any) -> str:
+        if value is None:
+            return "<c/>"
+
+        if isinstance(value, date):
+            return f'<c s="1"><v>{(value - EXCEL_EPOCH).days}</v></c>'
+
+        if isinstance(value, (int, float)):
+            return f"<c><v>{value!r}</v></c>" if math.isfinite(value) else "<c/>"
+
+        text = escape(str(value).translate(self.illegal))
+
+        return f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+    def write(
+        self, header: t.Sequence[str], types: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]
+    ) -> t.Iterator[bytes]:
+        output = ChunkWriter()
+
+        with zipfile.ZipFile(
+            t.cast(t.IO[bytes], output), mode="w", compression=zipfile.ZIP_DEFLATED
+        ) as workbook:
+            for name, part in self.parts.items():
+                workbook.writestr(name, part)
+
+            with workbook.open("xl/worksheets/sheet1.xml", mode="w", force_zip64=True) as sheet:
+                sheet.write(
+                    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                    b"<sheetData>"
+                )
+
+                lines = ["<row>" + "".join(self.cell(name) for name in header) + "</row>"]
+                size = 0
+
+                for row in rows:
+                    lines.append(
+                        "<row>" + "".join(map(self.cell, map(convert, types, row))) + "</row>"
+                    )
+                    size += len(lines[-1])
+
+                    if size >= CHUNK_SIZE:
+                        sheet.write("".join(lines).encode("UTF-8"))
+                        lines, size = list(), 0
+
+                        if data := output.drain():
+                            yield data
+
+                sheet.write("".join(lines).encode("UTF-8") + b"</sheetData></worksheet>")
+
+        yield output.drain()
+
+
+class ColumnarExport(ExportFormat):
+    """
+    A typed, column oriented binary format that can be loaded straight into arrays. All numbers
+    are little-endian:
+
+    - ``b"WLCB"``, a uint16 format version and a uint32 length followed by that many bytes of
+      UTF-8 JSON, ``{"columns": [{"name": ..., "type": ...}, ...]}``;
+    - then blocks of up to ``block_size`` rows, each a uint32 row count followed by every column
+      in turn as a uint32 byte length and the column data itself;
+    - and finally a row count of zero.
+
+    "int" columns are int64 (with ``-2**63`` for missing values), "float" columns are float64
+    (NaN), "date" columns are int32 days since 1970-01-01 (``-2**31``) and "str" columns are
+    ``count + 1`` uint32 end offsets (starting at 0) into the UTF-8 text that follows them.
+    """
+
+    name = "columnar"
+    extension = "wlcb"
+    mimetype = "application/octet-stream"
+
+    magic = b"WLCB"
+    version = 1
+    block_size = 65536
+
+    def column(self, kind: str, values: list[t.Any]) -> bytes:
+        if kind == "str":
+            encoded = [str(value).encode("UTF-8") for value in values]
+            offsets = array("I", [0])
+
+            for value in encoded:
+                offsets.append(offsets[-1] + len(value))
+
+            return self.little_endian(offsets) + b"".join(encoded)
+
+        if kind == "float":
+            data = array("d", (math.nan if value is None else value for value in values))
+
+        elif kind == "date":
+            data = array(
+                "i", (NULLS["i"] if value is None else (value - EPOCH).days for value in values)
+            )
+
+        else:
+            data = array("q", (NULLS["q"] if value is None else value for value in values))
+
+        return self.little_endian(data)
+
+    @staticmethod
+    def little_endian(data: array) -> bytes:  # type: ignore[type-arg]
+        if sys.byteorder != "little":
+            data.byteswap()
+
+        return data.tobytes()
+
+    def block(self, types: t.Sequence[str], rows: list[t.Sequence[t.Any]]) -> bytes:
+        columns = [
+            self.column(kind, [convert(kind, row[position]) for row in rows])
+            for position, kind in enumerate(types)
+        ]
+
+        return struct.pack("<I", len(rows)) + b"".join(
+            struct.pack("<I", len(column)) + column for column in columns
+        )
+
+    def write(
+        self, header: t.Sequence[str], types: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]
+    ) -> t.Iterator[bytes]:
+        schema = json.dumps(
+            {"columns": [{"name": name, "type": kind} for name, kind in zip(header, types)]}
+        ).encode("UTF-8")
+
+        yield self.magic + struct.pack("<HI", self.version, len(schema)) + schema
+
+        block: list[t.Sequence[t.Any]] = list()
+
+        for row in rows:
+            block.append(row)
+
+            if len(block) >= self.block_size:
+                yield self.block(types, block)
+                block = list()
+
+        if block:
+            yield self.block(types, block)
+
+        yield struct.pack("<I", 0)
+
+
+def read_columnar(data: bytes) -> dict[str, list[t.Any]]:
+    """
+    Loads a ``ColumnarExport`` back into lists of values by column name, mostly as a reference
+    for consumers writing their own readers.
+    """
+    if data[:4] != ColumnarExport.magic:
+        raise ValueError("Not a columnar export")
+
+    _, length = struct.unpack_from("<HI", data, 4)
+    position = 10 + length
+    columns = json.loads(data[10:position])["columns"]
+
+    output: dict[str, list[t.Any]] = {column["name"]: list() for column in columns}
+
+    while True:
+        (count,) = struct.unpack_from("<I", data, position)
+        position += 4
+
+        if count == 0:
+            return output
+
+        for column in columns:
+            (size,) = struct.unpack_from("<I", data, position)
+            chunk = data[position + 4 : position + 4 + size]
+            position += 4 + size
+
+            values = output[column["name"]]
+
+            if column["type"] == "str":
+                offsets = array("I", chunk[: 4 * (count + 1)])
+                text = chunk[4 * (count + 1) :]
+
+                if sys.byteorder != "little":
+                    offsets.byteswap()
+
+                values.extend(
+                    text[start:stop].decode("UTF-8") for start, stop in zip(offsets, offsets[1:])
+                )
+                continue
+
+            typecode = {"int": "q", "float": "d", "date": "i"}[column["type"]]
+            numbers = array(typecode, chunk)
+
+            if sys.byteorder != "little":
+                numbers.byteswap()
+
+            if column["type"] == "float":
+                values.extend(None if math.isnan(value) else value for value in numbers)
+
+            elif column["type"] == "date":
+                values.extend(
+                    None if value == NULLS["i"] else date.fromordinal(EPOCH.toordinal() + value)
+                    for value in numbers
+                )
+
+            else:
+                values.extend(None if value == NULLS["q"] else value for value in numbers)
+
+
+FORMATS: dict[str, ExportFormat] = {
+    export.name: export for export in (CsvExport(), NdjsonExport(), XlsxExport(), ColumnarExport())
+}
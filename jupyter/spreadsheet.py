@@ -1,12 +1,22 @@
 #!/usr/bin/env python
 # coding: utf-8
 
+import os
 import csv
 import sys
-from io import BytesIO, StringIO
+import json
+import mmap
+import time
+import shutil
+import typing as t
+import tempfile
+import itertools
+from io import StringIO, TextIOWrapper
+from array import array
 from pprint import pprint
-from urllib.request import urlopen
 from zipfile import ZipFile
+from urllib.request import urlopen
+from concurrent.futures import ThreadPoolExecutor
 
 REQUESTED_DATA = [
     "DailyOilList",
@@ -15,15 +25,237 @@ REQUESTED_DATA = [
     "ProductionDaysList",
 ]
 
+# The OGORA columns used: the production month (YYYYMM), each metric, and what
+# identifies the well-zone.
+MONTH, API, BLOCK_NUM, INTERVAL = 2, 8, 10, 15
+METRIC_COLUMNS = {"DailyOil": 5, "DailyGas": 6, "DailyWater": 7, "ProductionDays": 3}
+
+# Monthly volumes per well-zone are far below 2**31, and there are never more than
+# 31 production days in a month.
+METRIC_TYPECODES = {
+    "DailyOil": "i",
+    "DailyGas": "i",
+    "DailyWater": "i",
+    "ProductionDays": "b",
+}
+
+# Downloaded archives are kept here. The yearly OGORA archives are for closed years
+# that never change, so they are kept for good; the current-year archive and the
+# field list are fetched again once they are older than REFRESH_DAYS.
+CACHE = "ogora_cache"
+REFRESH_DAYS = 7
+DOWNLOAD_WORKERS = 6
+CHUNK_SIZE = 1024 * 1024
+
+# Each archive's parsed production is kept beside it as a directory of typed column
+# files, in the order of a production record; the strings are dictionary-encoded.
+STORE_VERSION = 1
+STORE_COLUMNS = {
+    "api": "i",
+    "interval": "i",
+    "block_num": "i",
+    "month": "i",
+    "oil": "i",
+    "gas": "i",
+    "water": "i",
+    "days": "b",
+}
+STRING_COLUMNS = ("api", "interval", "block_num")
+
+
+def cache_path(url: str) -> str:
+    return os.path.join(CACHE, url.rsplit("/", 1)[-1])
+
+
+def max_age(url: str) -> float | None:
+    return REFRESH_DAYS * 24 * 60 * 60 if url in REFRESHED_LINKS else None
+
+
+def fetch(url: str) -> str:
+    """
+    Returns the path of the cached copy of ``url``, downloading it first if there is
+    none (or it is due to be refreshed). The archive is streamed to a temporary file
+    and only renamed into place once complete, so an interrupted download never
+    leaves a broken copy behind; if refreshing fails, the cached copy is used instead.
+    """
+    path = cache_path(url)
+    limit = max_age(url)
+
+    if os.path.exists(path) and (
+        limit is None or time.time() - os.path.getmtime(path) < limit
+    ):
+        return path
+
+    os.makedirs(CACHE, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=CACHE, suffix=".part")
+
+    try:
+        with os.fdopen(descriptor, "wb") as part_file, urlopen(url) as web_file:
+            shutil.copyfileobj(web_file, part_file, CHUNK_SIZE)
+
+        os.replace(temporary, path)
+
+    except OSError:
+        os.unlink(temporary)
+
+        if not os.path.exists(path):
+            raise
+
+        stamp = time.ctime(os.path.getmtime(path))
+        print(f"Could not refresh {url}; using the copy from {stamp}")
+
+    return path
+
+
+def fetch_all(urls: list[str]) -> dict[str, str]:
+    """
+    Fetches every archive missing from the cache at the same time, rather than one by
+    one.
+    """
+    with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+        return dict(zip(urls, executor.map(fetch, urls)))
+
+
+def read_rows(url: str, file: str) -> t.Iterator[list[str]]:
+    """
+    Yields the rows of ``file`` in the cached archive for ``url`` as they are read from
+    the zip member, quoted fields and all, so no archive is ever held in memory whole.
+    """
+    with ZipFile(fetch(url)) as archive, archive.open(file) as member:
+        for row in csv.reader(TextIOWrapper(member, encoding="utf-8", newline="")):
+            if row:
+                yield row
+
+
+def production_records(
+    rows: t.Iterable[list[str]],
+) -> t.Iterator[tuple[t.Any, ...]]:
+    """
+    Types OGORA rows as they stream by, as ``(well_zone, block_num, api, interval,
+    month, *metrics)`` with the month as a YYYYMM number and the metrics (in the order
+    of METRIC_COLUMNS) as numbers.
+    """
+    columns = list(METRIC_COLUMNS.values())
+
+    for row in rows:
+        yield (
+            row[API] + row[INTERVAL],
+            row[BLOCK_NUM],
+            row[API],
+            row[INTERVAL],
+            int(row[MONTH]),
+            *[number(row[column]) for column in columns],
+        )
+
+
+class ProductionStore:
+    """
+    The production records of one cached archive, parsed once and saved next to it as
+    one raw array file per column (native byte order) plus a manifest holding the
+    string dictionaries. Columns are memory mapped when read, so an analysis only
+    loads the columns and years it uses. The store is rebuilt whenever its archive
+    has changed, which only ever happens to the current-year one.
+    """
+
+    def __init__(self, archive: str) -> None:
+        self.archive = archive
+        self.directory = f"{archive}.columns"
+
+    def source(self) -> dict[str, int]:
+        status = os.stat(self.archive)
+
+        return {"size": status.st_size, "mtime": status.st_mtime_ns}
+
+    def manifest(self) -> dict[str, t.Any] | None:
+        try:
+            with open(os.path.join(self.directory, "manifest.json")) as manifest_file:
+                manifest: dict[str, t.Any] = json.load(manifest_file)
+
+        except (OSError, ValueError):
+            return None
+
+        if manifest["version"] != STORE_VERSION or manifest["source"] != self.source():
+            return None
+
+        return manifest
+
+    def build(self, records: t.Iterable[tuple[t.Any, ...]]) -> None:
+        columns = {name: array(typecode) for name, typecode in STORE_COLUMNS.items()}
+        codes: dict[str, dict[str, int]] = {name: dict() for name in STRING_COLUMNS}
+
+        for well_zone, block_num, api, interval, *values in records:
+            strings = {"api": api, "interval": interval, "block_num": block_num}
+
+            for name, value in strings.items():
+                columns[name].append(codes[name].setdefault(value, len(codes[name])))
+
+            for name, value in zip(list(STORE_COLUMNS)[3:], values):
+                columns[name].append(value)
+
+        # Written to a new directory that only replaces the old one once complete.
+        temporary = tempfile.mkdtemp(dir=CACHE, suffix=".columns")
+
+        for name, column in columns.items():
+            with open(os.path.join(temporary, f"{name}.bin"), "wb") as column_file:
+                column.tofile(column_file)
+
+        with open(os.path.join(temporary, "manifest.json"), "w") as manifest_file:
+            json.dump(
+                {
+                    "version": STORE_VERSION,
+                    "source": self.source(),
+                    "rows": len(columns["month"]),
+                    "dictionaries": {name: list(codes[name]) for name in codes},
+                },
+                manifest_file,
+            )
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(temporary, self.directory)
+
+    def column(self, name: str) -> "array[int] | memoryview":
+        """
+        The column as a read-only view of its memory-mapped file; string columns are
+        their dictionary codes.
+        """
+        with open(os.path.join(self.directory, f"{name}.bin"), "rb") as column_file:
+            if os.fstat(column_file.fileno()).st_size == 0:
+                return array(STORE_COLUMNS[name])
+
+            mapped = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view: memoryview = memoryview(mapped)
+
+        view = view.cast(STORE_COLUMNS[name])  # type: ignore[call-overload]
+
+        return view
+
+    def records(self) -> t.Iterator[tuple[t.Any, ...]]:
+        """
+        Yields the same records as ``production_records`` does, from the columns.
+        """
+        dictionaries = t.cast(dict[str, t.Any], self.manifest())["dictionaries"]
+        apis, intervals, block_nums = (dictionaries[name] for name in STRING_COLUMNS)
+
+        for api, interval, block_num, month, *values in zip(
+            *[self.column(name) for name in STORE_COLUMNS]
+        ):
+            api, interval = apis[api], intervals[interval]
 
-def url_to_list(url: str, file: str) -> list:
-    with urlopen(url) as data:
-        archive = ZipFile(BytesIO(data.read()))
+            yield (api + interval, block_nums[block_num], api, interval, month, *values)
 
-    text = archive.open(file).read().decode()
-    text = text.replace('"', "")
 
-    return [line.split(",") for line in text.split("\n")]
+def stored_records(url: str, file: str) -> t.Iterator[tuple[t.Any, ...]]:
+    """
+    The production records of an OGORA archive, from its column store, which is built
+    from the delimited text the first time (and again whenever the archive changes).
+    """
+    store = ProductionStore(fetch(url))
+
+    if store.manifest() is None:
+        store.build(production_records(read_rows(url=url, file=file)))
+
+    return store.records()
 
 
 def create_field_name_dictionary(fields: list) -> dict:
@@ -38,38 +270,123 @@ def create_field_name_dictionary(fields: list) -> dict:
     return dictionary
 
 
-def list_maker(data: dict):
-    values = list()
-    for month in date_generator(FIRST_MONTH, LAST_MONTH):
-        if month in data.keys():
-            values.append(data[month])
-
-        else:
-            values.append("0")
-
-    return values
-
-
-def month_range(data: dict) -> tuple:
-    first_month = sys.maxsize
-    last_month = 0
-
-    for wz in data:
-        min_month = int(min(data[wz]["ProductionDays"].keys()))
-        max_month = int(max(data[wz]["ProductionDays"].keys()))
+def month_index(month: int, first_month: int) -> int:
+    return (month // 100 - first_month // 100) * 12 + month % 100 - first_month % 100
 
-        if min_month < first_month:
-            first_month = min_month
 
-        if max_month > last_month:
-            last_month = max_month
-
-    months = (
-        ((last_month // 100) - (first_month // 100)) * 12
-        + (last_month % 100 - first_month % 100)
-        + 1
-    )
-    return first_month, last_month, months
+def number(value: str) -> int:
+    try:
+        return int(value) if value else 0
+
+    except ValueError:
+        return round(float(value))
+
+
+class ProductionMatrix:
+    """
+    The production of every well-zone for every month, as typed arrays per year and
+    metric: twelve months in a row for each well-zone (in the order they first
+    appear), with zeros where nothing was reported. Well-zones and years are added as
+    they turn up, so the matrix fills in a single pass over a stream of records, and
+    its size depends on the number of well-zones and years rather than on the number
+    of rows read.
+    """
+
+    def __init__(self) -> None:
+        self.well_zones: dict[str, int] = dict()
+        self.details: list[tuple[str, str, str]] = list()
+        self.years: dict[int, tuple["array[int]", ...]] = dict()
+
+        self.first_month = sys.maxsize
+        self.last_month = 0
+
+    def year(self, year: int) -> tuple["array[int]", ...]:
+        if year not in self.years:
+            self.years[year] = tuple(
+                array(
+                    typecode, bytes(array(typecode).itemsize * 12 * len(self.details))
+                )
+                for typecode in METRIC_TYPECODES.values()
+            )
+
+        return self.years[year]
+
+    def row(self, well_zone: str) -> int:
+        if well_zone not in self.well_zones:
+            self.well_zones[well_zone] = len(self.details)
+            self.details.append(("", "", ""))
+
+            for arrays in self.years.values():
+                for values in arrays:
+                    values.frombytes(bytes(values.itemsize * 12))
+
+        return self.well_zones[well_zone]
+
+    def add(self, records: t.Iterable[tuple[t.Any, ...]]) -> None:
+        """
+        Fills the matrix from ``production_records``. As before, a well-zone keeps the
+        block number of the last row reported for it, and the last value for a month
+        wins.
+        """
+        for well_zone, block_num, api, interval, month, *metrics in records:
+            position = self.row(well_zone)
+            self.details[position] = (block_num, api, interval)
+
+            cell = position * 12 + month % 100 - 1
+
+            for values, value in zip(self.year(month // 100), metrics):
+                values[cell] = value
+
+            self.first_month = min(self.first_month, month)
+            self.last_month = max(self.last_month, month)
+
+    def month_range(self) -> tuple[int, int, int]:
+        return (
+            self.first_month,
+            self.last_month,
+            month_index(self.last_month, self.first_month) + 1,
+        )
+
+    def write(self, metric: str, path: str, field_names: dict[str, str]) -> None:
+        """
+        Writes one metric as CSV straight from its arrays, a row per well-zone and a
+        column per month from the first to the last one reported.
+        """
+        first_month, last_month, months = self.month_range()
+        index = list(METRIC_TYPECODES).index(metric)
+
+        # A year nobody reported anything for is all zeros.
+        typecode = METRIC_TYPECODES[metric]
+        zeros = array(
+            typecode, bytes(array(typecode).itemsize * 12 * len(self.details))
+        )
+        years = [
+            self.years[year][index] if year in self.years else zeros
+            for year in range(first_month // 100, last_month // 100 + 1)
+        ]
+        skip = first_month % 100 - 1
+
+        with open(path, "w", newline="") as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(
+                ["Field", "BlockNum", "API", "Int", "WellZone"]
+                + list(date_generator(first_month, last_month))
+            )
+
+            for well_zone, position in self.well_zones.items():
+                block_num, api, interval = self.details[position]
+                field = field_names.get(block_num.replace(" ", ""), "NAME_NOT_FOUND")
+                start = position * 12
+
+                values: list[int] = list()
+
+                for year in years:
+                    values += year[start : start + 12].tolist()
+
+                writer.writerow(
+                    [field, block_num, api, interval, well_zone]
+                    + values[skip : skip + months]
+                )
 
 
 def date_generator(start: int, stop: int) -> str:
@@ -181,98 +498,31 @@ ogora_links = [
     ("https://www.data.bsee.gov/Production/Files/ogoradelimit.zip", "ogoradelimit.txt"),
 ]
 
-ogora_data = url_to_list(url=ogora_links[19][0], file=ogora_links[19][1])[:-1]
-ogora_data = (
-    ogora_data + url_to_list(url=ogora_links[20][0], file=ogora_links[20][1])[:-1]
-)
-ogora_data = (
-    ogora_data + url_to_list(url=ogora_links[21][0], file=ogora_links[21][1])[:-1]
-)
-
 fields_link = "https://www.data.bsee.gov/Other/Files/DeepQualRawData.zip"
 
-fields_data = url_to_list(
-    url=fields_link, file="DeepQualRawData/mv_deep_water_field_leases.txt"
-)[1:-1]
-
-fields_dict = create_field_name_dictionary(fields=fields_data)
-
+# Only the archives that can still change are ever downloaded again.
+REFRESHED_LINKS = {ogora_links[-1][0], fields_link}
 
-ogora_dict = {}
+# The years to build the spreadsheets from (2015-2017); ogora_links[:-1] would be the
+# whole history from 1996, and ogora_links[-1] the current year.
+selected_links = ogora_links[19:22]
 
-for row in ogora_data:
-    API = row[8]
-    Int = row[15]
-    BlockNum = row[10]
+fetch_all([url for url, _ in selected_links] + [fields_link])
 
-    WellZone = API + Int
-
-    ogora_dict[WellZone] = {
-        "BlockNum": BlockNum,
-        "API": API,
-        "Int": Int,
-        "DailyOil": dict(),
-        "DailyGas": dict(),
-        "DailyWater": dict(),
-        "ProductionDays": dict(),
-    }
-
-#     if WellZone not in ogora_dict.keys():
-#         ogora_dict[WellZone] = {
-#             u'BlockNum': BlockNum,
-#             u'API': API,
-#             u'Int': Int,
-#             u'FieldName': u'MISSING_DATA',
-#             u'DailyOil': dict(),
-#             u'DailyGas': dict(),
-#             u'DailyWater': dict(),
-#             u'ProductionDays': dict()
-#         }
-
-for well in list(ogora_dict.keys()):
-    a = ogora_dict[well]["BlockNum"].replace(" ", "")
-
-    try:
-        ogora_dict[well]["FieldName"] = fields_dict[a]
-
-    except KeyError:
-        ogora_dict[well]["FieldName"] = "NAME_NOT_FOUND"
+fields_data = read_rows(
+    url=fields_link, file="DeepQualRawData/mv_deep_water_field_leases.txt"
+)
 
-for row in ogora_data:
-    ogora_dict[row[8] + row[15]]["DailyOil"][row[2]] = row[5]
-    ogora_dict[row[8] + row[15]]["DailyGas"][row[2]] = row[6]
-    ogora_dict[row[8] + row[15]]["DailyWater"][row[2]] = row[7]
-    ogora_dict[row[8] + row[15]]["ProductionDays"][row[2]] = row[3]
+fields_dict = create_field_name_dictionary(
+    fields=list(itertools.islice(fields_data, 1, None))
+)
 
+production = ProductionMatrix()
 
-FIRST_MONTH, LAST_MONTH, TOTAL_MONTHS = month_range(ogora_dict)
+for url, file in selected_links:
+    production.add(stored_records(url=url, file=file))
 
-for wz in ogora_dict.keys():
-    for info in REQUESTED_DATA:
-        ogora_dict[wz][info] = list_maker(ogora_dict[wz][info[:-4]])
+FIRST_MONTH, LAST_MONTH, TOTAL_MONTHS = production.month_range()
 
 for request in REQUESTED_DATA:
-    data_collector = list()
-
-    data_collector.append(
-        ["Field", "BlockNum", "API", "Int", "WellZone"]
-        + list(date_generator(FIRST_MONTH, LAST_MONTH))
-    )
-
-    for wz in ogora_dict.keys():
-        Field = ogora_dict[wz]["FieldName"]
-        BlockNum = ogora_dict[wz]["BlockNum"]
-        API = ogora_dict[wz]["API"]
-        Int = ogora_dict[wz]["Int"]
-
-        WellZone = wz
-
-        numbers = ogora_dict[wz][request]
-
-        data = [Field, BlockNum, API, Int, WellZone] + numbers[:]
-
-        data_collector.append(data)
-
-    with open(f"{request}.csv", "w", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerows(data_collector)
+    production.write(request[:-4], f"{request}.csv", field_names=fields_dict)
@@ -1,23 +1,345 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import abc
 import csv
+import sys
+import copy
+import gzip
+import json
+import zlib
+import shutil
 import typing as t
+import hashlib
 import zipfile
-from io import BytesIO, StringIO
-from math import ceil
-from datetime import datetime, timedelta
-from urllib.request import urlopen
-
-from bs4 import Tag, BeautifulSoup
+import contextlib
+from io import BytesIO
+from math import inf, ceil
+from time import sleep, monotonic
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from threading import Lock, Event, Thread
+from http.client import HTTPException
+from urllib.error import URLError, HTTPError
+from email.message import Message
+from urllib.request import Request, urlopen
+from concurrent.futures import FIRST_COMPLETED, Future
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import dates
+import delta
+import exports
+import metrics
+import storage
+from columnar import Table, Column, sizeof
+
+if t.TYPE_CHECKING:
+    from bs4 import Tag
+
+TIME_FORMAT = "%m/%d/%Y %I:%M:%S %p"
+CHUNK_SIZE = 1024 * 1024
+
+HTTP_TIMEOUT = 60
+HTTP_RETRIES = 5
+HTTP_BACKOFF = 1.0
+HTTP_MAX_BACKOFF = 30.0
+
+# Bump whenever the layout of the on-disk snapshot files changes. Individual parsers carry their
+# own ``parser_version`` for changes to the shape of ``parsed_data``.
+SNAPSHOT_VERSION = 1
+
+# How many versions of the export are kept in storage, counting the current one. The previous
+# version is kept so that downloads already sent to it can still finish after a refresh.
+KEPT_EXPORTS = 2
+
+
+T = t.TypeVar("T")
 
 
 class WebLeaseException(Exception):
     pass
 
 
+class BuildTimeout(WebLeaseException):
+    pass
+
+
+class VersionChanged(BuildTimeout):
+    pass
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent builds of the same thing: the first caller for a key starts the build
+    on a thread of its own, and every caller for that key until it finishes (the first one
+    included) waits on that same build instead of starting another.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+        self.builds: dict[str, Future[t.Any]] = dict()
+
+    def run(self, key: str, build: t.Callable[[], T], timeout: float | None = None) -> T:
+        """
+        Returns the result of the build for ``key``, raising ``BuildTimeout`` if it has not
+        finished within ``timeout`` seconds. The build carries on regardless, for whoever asks
+        next.
+        """
+        with self.lock:
+            future = self.builds.get(key)
+
+            if future is None:
+                future = self.builds[key] = Future()
+                Thread(target=self.complete, args=(key, build, future), daemon=True).start()
+
+        try:
+            return t.cast(T, future.result(timeout=timeout))
+
+        except FutureTimeoutError:
+            raise BuildTimeout(f"Still building {key} after {timeout} seconds")
+
+    def complete(self, key: str, build: t.Callable[[], t.Any], future: Future[t.Any]) -> None:
+        try:
+            future.set_result(build())
+
+        except BaseException as error:  # pylint: disable=broad-except
+            future.set_exception(error)
+
+        finally:
+            with self.lock:
+                del self.builds[key]
+
+
+class CachedExport:
+    """
+    A finished CSV export for one version of the source data, kept in storage alongside a
+    pre-compressed gzip copy so neither has to be rebuilt, by any worker, until one of the
+    datasets changes.
+    """
+
+    def __init__(self, version: str) -> None:
+        self.version = version
+
+        # The rows the export was written from, when it was written by this process
+        self.index: "LeaseIndex | None" = None
+
+    def name(self, compressed: bool = False, extension: str = "csv") -> str:
+        return f"export-{self.version}.{extension}" + (".gz" if compressed else "")
+
+    def path(self, compressed: bool = False, extension: str = "csv") -> str:
+        return os.path.abspath(storage.path(self.name(compressed=compressed, extension=extension)))
+
+    def etag(self, compressed: bool = False, extension: str = "csv") -> str:
+        etag = self.version if extension == "csv" else f"{self.version}-{extension}"
+
+        return f"{etag}-gz" if compressed else etag
+
+    def exists(self, extension: str = "csv") -> bool:
+        if extension != "csv":
+            return os.path.exists(self.path(extension=extension))
+
+        return os.path.exists(self.path()) and os.path.exists(self.path(compressed=True))
+
+    def write(self, chunks: t.Iterable[bytes]) -> None:
+        with storage.atomic_write(self.name()) as plain_file:
+            with storage.atomic_write(self.name(compressed=True)) as compressed_file:
+                with gzip.GzipFile(fileobj=compressed_file, mode="wb", mtime=0) as gzip_file:
+                    for chunk in chunks:
+                        plain_file.write(chunk)
+                        gzip_file.write(chunk)
+
+        self.prune()
+
+    def prune(self) -> None:
+        """
+        Removes the files of every version but the ``KEPT_EXPORTS`` most recently written.
+        """
+        versions = {
+            name: name[len("export-") :].split(".", 1)[0]
+            for name in os.listdir(storage.STORAGE)
+            if name.startswith("export-")
+        }
+        written: dict[str, float] = {self.version: inf}
+
+        for name, version in versions.items():
+            with contextlib.suppress(FileNotFoundError):
+                modified = os.path.getmtime(storage.path(name))
+                written[version] = max(written.get(version, 0), modified)
+
+        kept = sorted(written, key=written.__getitem__, reverse=True)[:KEPT_EXPORTS]
+
+        for name, version in versions.items():
+            if version not in kept:
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(storage.path(name))
+
+    def write_format(self, extension: str, chunks: t.Iterable[bytes]) -> None:
+        """
+        Saves the export in one of the other formats, alongside the CSV of the same version.
+        """
+        with storage.atomic_write(self.name(extension=extension)) as export_file:
+            for chunk in chunks:
+                export_file.write(chunk)
+
+    @property
+    def body(self) -> bytes:
+        with open(file=self.path(), mode="rb") as export_file:
+            return export_file.read()
+
+
+class LeaseIndex:
+    """
+    Secondary indexes over the joined export rows of one version of the data, so single leases
+    and filtered sets of them can be looked up without going through the whole export. Names
+    and codes are matched case-insensitively; results always come back in export order.
+    """
+
+    def __init__(
+        self, version: str, header: list[str], leases: dict[str, tuple[tuple[t.Any, ...], ...]]
+    ) -> None:
+        self.version = version
+        self.header = header
+        self.leases = leases
+
+        self.positions = {lease: position for position, lease in enumerate(leases)}
+
+        self.operators: dict[str, set[str]] = dict()
+        self.owners: dict[str, set[str]] = dict()
+        self.area_codes: dict[str, set[str]] = dict()
+        self.block_numbers: dict[str, set[str]] = dict()
+        self.statuses: dict[str, set[str]] = dict()
+
+        operator = header.index("Operator")
+        owner = header.index("Primary Owner")
+        self.block = block = header.index("BlockNum")
+        self.status = status = header.index("Lease Status Code")
+        expiration = header.index("Lease Expiration Date")
+
+        # Most values repeat across many leases, so each is only normalised once.
+        keys: dict[str, str] = dict()
+        expirations: list[tuple[date, str]] = list()
+
+        def add(index: dict[str, set[str]], value: str, lease: str) -> None:
+            key = keys.get(value)
+
+            if key is None:
+                key = keys[value] = self.normalise(value)
+
+            index.setdefault(key, set()).add(lease)
+
+        for lease, rows in leases.items():
+            # "Primary Owner" is formatted as "Company Name (Percentage Ownership%)".
+            add(self.owners, rows[0][owner].rpartition(" (")[0], lease)
+            add(self.operators, rows[0][operator], lease)
+
+            for row in rows:
+                # BlockNum is the two letter AREA_CODE followed by the BLOCK_NUM.
+                add(self.area_codes, row[block][:2], lease)
+                add(self.block_numbers, row[block][2:], lease)
+                add(self.statuses, row[status], lease)
+
+            if rows[0][expiration] != "N/A":
+                expirations.append((dates.parse_output(rows[0][expiration]), lease))
+
+        expirations.sort()
+
+        self.expiration_dates = [expires for expires, _ in expirations]
+        self.expiration_leases = [lease for _, lease in expirations]
+
+    @staticmethod
+    def normalise(value: str) -> str:
+        return " ".join(value.split()).casefold()
+
+    def query(
+        self,
+        operator: str | None = None,
+        owner: str | None = None,
+        area_code: str | None = None,
+        block_number: str | None = None,
+        status: str | None = None,
+        expires_after: date | None = None,
+        expires_before: date | None = None,
+    ) -> list[str]:
+        """
+        Returns the lease numbers matching every filter given (and all of them when none are),
+        with both ends of the expiration date range inclusive.
+        """
+        matches: list[set[str]] = [
+            index.get(self.normalise(value), set())
+            for index, value in (
+                (self.operators, operator),
+                (self.owners, owner),
+                (self.area_codes, area_code),
+                (self.block_numbers, block_number),
+                (self.statuses, status),
+            )
+            if value is not None
+        ]
+
+        if expires_after is not None or expires_before is not None:
+            start = (
+                0 if expires_after is None else bisect_left(self.expiration_dates, expires_after)
+            )
+            stop = (
+                len(self.expiration_dates)
+                if expires_before is None
+                else bisect_right(self.expiration_dates, expires_before)
+            )
+
+            matches.append(set(self.expiration_leases[start:stop]))
+
+        if not matches:
+            return list(self.leases)
+
+        leases = set.intersection(*sorted(matches, key=len))
+
+        # The area, block and status filters each match on any one row of a lease, so when more
+        # than one of them is given make sure a single row matches all of them.
+        if sum(value is not None for value in (area_code, block_number, status)) > 1:
+            leases = {
+                lease
+                for lease in leases
+                if any(
+                    self.row_matches(row, area_code, block_number, status)
+                    for row in self.leases[lease]
+                )
+            }
+
+        return sorted(leases, key=self.positions.__getitem__)
+
+    def row_matches(
+        self,
+        row: tuple[t.Any, ...],
+        area_code: str | None,
+        block_number: str | None,
+        status: str | None,
+    ) -> bool:
+        return all(
+            value is None or self.normalise(field) == self.normalise(value)
+            for field, value in (
+                (row[self.block][:2], area_code),
+                (row[self.block][2:], block_number),
+                (row[self.status], status),
+            )
+        )
+
+    def records(self, lease: str) -> list[dict[str, t.Any]]:
+        return [dict(zip(self.header, row)) for row in self.leases[lease]]
+
+    def rows(self) -> t.Iterator[tuple[t.Any, ...]]:
+        """
+        Every joined row of this version of the data, in export order.
+        """
+        for rows in self.leases.values():
+            yield from rows
+
+
 class WebLeaseWrapper:
+    dataset_names = ("owner", "area_block", "lease_data", "companies", "lease_operators")
+
     def __init__(
         self,
         owner: "OwnerData",
@@ -25,7 +347,15 @@ class WebLeaseWrapper:
         lease_data: "LeaseData",
         companies: "CompanyNumberToName",
         lease_operators: "LeaseNumberToOperator",
+        workers: int = 5,
+        timeout: float | None = None,
     ) -> None:
+        """
+        ``workers`` sets how many datasets are prepared at once (``1`` prepares them one after the
+        other), and ``timeout`` is the number of seconds each dataset is allowed once it starts.
+        A dataset left waiting for a worker behind others that overran is given up on once the
+        whole batch has had the time it would have taken at ``timeout`` seconds per dataset.
+        """
         self.owner = owner
         self.area_block = area_block
         self.lease_data = lease_data
@@ -47,65 +377,711 @@ class WebLeaseWrapper:
             "Operator",
         ]
 
+        # The type of each column, for the export formats that keep them.
+        self.column_types = [
+            "str",
+            "str",
+            "str",
+            "str",
+            "str",
+            "date",
+            "int",
+            "str",
+            "int",
+            "date",
+            "float",
+            "str",
+        ]
+
+        self.workers = workers
+        self.timeout = timeout
+
+        self.cached_export: CachedExport | None = None
+        self.lease_query: LeaseIndex | None = None
+
+        # Only one build mutates the datasets and joined rows at a time, and concurrent requests
+        # for the same one share it.
+        self.builds = SingleFlight()
+        self.build_lock = Lock()
+
+    def datasets(self) -> tuple["ZipData", ...]:
+        return tuple(getattr(self, name) for name in self.dataset_names)
+
+    def memory_report(self) -> dict[str, int]:
+        """
+        The approximate number of bytes held by each dataset's parsed data.
+        """
+        return {name: getattr(self, name).memory_usage() for name in self.dataset_names}
+
+    def data_version(self, check: bool = True) -> str:
+        """
+        Combines the snapshot keys of all five datasets into a single digest, which changes
+        whenever any of the underlying BSEE files (or their parsers) do. With ``check`` turned
+        off, the datasets are taken as they are rather than checked for newer data first.
+
+        The check is made on copies of the datasets, as it runs outside ``build_lock``: only a
+        build moves the datasets themselves on to newer stamps.
+        """
+        datasets = self.datasets()
+
+        if check:
+            datasets = tuple(copy.copy(dataset) for dataset in datasets)
+
+            for dataset in datasets:
+                dataset.cache()
+
+        keys = "\n".join([dataset.snapshot_key() for dataset in datasets])
+
+        return hashlib.sha256(keys.encode()).hexdigest()
+
+    def export(self, timeout: float | None = None) -> CachedExport:
+        """
+        Returns the export for the current version of the data, building it first if need be.
+        A caller that has waited ``timeout`` seconds for the build gets the previous export
+        instead while there is one, and ``BuildTimeout`` otherwise.
+        """
+        version = self.data_version()
+
+        if self.cached_export is not None and self.cached_export.version == version:
+            return self.cached_export
+
+        try:
+            return self.builds.run(f"export-{version}", lambda: self.build_export(version), timeout)
+
+        except BuildTimeout:
+            if self.cached_export is None or not self.cached_export.exists():
+                raise
+
+            return self.cached_export
+
+    def build_export(self, version: str) -> CachedExport:
+        export = CachedExport(version=version)
+
+        with storage.lock("export"):
+            if not export.exists():
+                export.index = self.prepared(version)
+
+                with metrics.stage("WebLeaseWrapper", "export", format="csv") as info:
+                    export.write(metrics.measured(self.iter_csv(rows=export.index.rows()), info))
+
+        self.cached_export = export
+
+        return export
+
+    def rebuild_export(self) -> CachedExport:
+        """
+        Rebuilds the export from the datasets as they are currently prepared, without checking
+        for (or fetching) anything newer.
+        """
+        with self.build_lock:
+            self.prepare_csv_list(self.data_version(check=False))
+            index = t.cast(LeaseIndex, self.lease_query)
+
+        export = CachedExport(version=index.version)
+        export.index = index
+
+        with storage.lock("export"):
+            if not export.exists():
+                with metrics.stage("WebLeaseWrapper", "export", format="csv") as info:
+                    export.write(metrics.measured(self.iter_csv(rows=index.rows()), info))
+
+        self.cached_export = export
+
+        return self.cached_export
+
     def prepare_data(self) -> None:
-        self.owner.prepare()
-        self.area_block.prepare()
-        self.lease_data.prepare()
-        self.companies.prepare()
-        self.lease_operators.prepare()
+        with metrics.stage("WebLeaseWrapper", "prepare_data"):
+            # A dataset preparing on this thread could not be given up on, so a timeout always
+            # goes through the executor, even with a single worker.
+            if self.workers <= 1 and self.timeout is None:
+                for dataset in self.datasets():
+                    dataset.prepare()
 
-    def prepare_csv_list(self) -> None:
-        self.body_rows = list()
+                return
 
-        for row in self.owner.parsed_data.keys():
-            lease, aliquot = row.split(";")
+            workers = max(self.workers, 1)
+            datasets = self.datasets()
+            timeout = inf if self.timeout is None else self.timeout
+
+            started: dict[ZipData, float] = dict()
+            errors: list[str] = list()
+
+            def run(dataset: ZipData) -> None:
+                started[dataset] = monotonic()
+                dataset.prepare()
+
+            batch_deadline = monotonic() + timeout * ceil(len(datasets) / workers)
 
-            owner = self.owner.format_owner(self.owner.parsed_data[row])
+            def deadline(dataset: ZipData) -> float:
+                return min(started.get(dataset, inf) + timeout, batch_deadline)
 
-            while len(self.area_block.parsed_data[lease]) > 0:
-                self.body_rows.append(
-                    [lease.strip()]
-                    + owner
-                    + self.area_block.parsed_data[lease].pop(0)
-                    + self.lease_data.parsed_data[lease]
-                    + [self.companies.parsed_data[self.lease_operators.parsed_data[lease]]]
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="weblease")
+
+            try:
+                futures: dict[Future[None], ZipData] = {
+                    executor.submit(run, dataset): dataset for dataset in datasets
+                }
+                pending = set(futures)
+
+                while pending:
+                    remaining = min(deadline(futures[future]) for future in pending) - monotonic()
+
+                    done, pending = wait(
+                        pending,
+                        timeout=None if remaining == inf else max(remaining, 0),
+                        return_when=FIRST_COMPLETED,
+                    )
+
+                    for future in done:
+                        if (error := future.exception()) is not None:
+                            errors.append(f"{type(futures[future]).__name__}: {error}")
+
+                    for future in list(pending):
+                        dataset = futures[future]
+
+                        if monotonic() >= deadline(dataset):
+                            pending.discard(future)
+                            errors.append(
+                                f"{type(dataset).__name__}: timed out after {self.timeout} seconds"
+                                if dataset in started
+                                else f"{type(dataset).__name__}: never started, as the workers "
+                                "were all held by datasets that timed out"
+                            )
+
+            finally:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+            if errors:
+                raise WebLeaseException("Could not prepare the data:\n" + "\n".join(errors))
+
+    def leases(self, timeout: float | None = None) -> LeaseIndex:
+        """
+        Returns the query indexes for the current version of the data, rebuilding them first if
+        they are missing or out of date. As with ``export``, a caller that has waited
+        ``timeout`` seconds gets the previous indexes if there are any.
+        """
+        version = self.data_version()
+
+        if self.lease_query is not None and self.lease_query.version == version:
+            return self.lease_query
+
+        try:
+            return self.prepared(version, timeout)
+
+        except BuildTimeout:
+            if self.lease_query is None:
+                raise
+
+            return self.lease_query
+
+    def prepared(self, version: str, timeout: float | None = None) -> LeaseIndex:
+        """
+        Prepares and joins the datasets for ``version`` unless that has been done already, once
+        however many threads ask for it at the same time. Only the current version of the data
+        can be prepared; asking for any other raises ``VersionChanged``.
+        """
+
+        def build() -> LeaseIndex:
+            with self.build_lock:
+                if self.lease_query is None or self.lease_query.version != version:
+                    # The datasets are checked for newer data, and the version they make up
+                    # taken, before anything is prepared, so the rows are labelled with the
+                    # version they were prepared from.
+                    for dataset in self.datasets():
+                        dataset.cache()
+
+                    current = self.data_version(check=False)
+
+                    self.prepare_data()
+                    self.prepare_csv_list(current)
+
+                return t.cast(LeaseIndex, self.lease_query)
+
+        if self.lease_query is not None and self.lease_query.version == version:
+            return self.lease_query
+
+        index = self.builds.run(f"prepare-{version}", build, timeout)
+
+        # Newer data may have turned up by the time the build got to check.
+        if index.version != version:
+            raise VersionChanged(f"Version {version} was replaced while it was being prepared")
+
+        return index
+
+    def prepare_csv_list(self, version: str) -> None:
+        """
+        Joins the prepared datasets into the rows and indexes of ``version``, which is taken by
+        the caller (holding ``build_lock``) before the datasets were prepared.
+        """
+        with metrics.stage("WebLeaseWrapper", "join") as info:
+            self.lease_index = self.join()
+            self.body_rows = [row for rows in self.lease_index.values() for row in rows]
+
+            info["rows"] = len(self.body_rows)
+
+        with metrics.stage("WebLeaseWrapper", "index", rows=len(self.body_rows)):
+            self.lease_query = LeaseIndex(
+                version=version, header=self.header_row, leases=self.lease_index
+            )
+
+        if not delta.saved(version):
+            with metrics.stage("WebLeaseWrapper", "delta_save", rows=len(self.body_rows)):
+                delta.save(
+                    version,
+                    delta.snapshot(
+                        self.lease_index, self.aliquots(), block=self.header_row.index("BlockNum")
+                    ),
                 )
 
+    def aliquots(self) -> dict[str, str]:
+        """
+        The owner aliquot each lease's rows are joined to, which (as in ``join``) is the first
+        one listed for the lease.
+        """
+        aliquots: dict[str, str] = dict()
+
+        for row in self.owner.parsed_data:
+            lease, aliquot = row.split(";")
+            aliquots.setdefault(lease, aliquot)
+
+        return aliquots
+
+    def changes(self, since: str, version: str) -> t.Iterator[tuple[str, tuple[t.Any, ...]]] | None:
+        """
+        The rows added, changed and removed between an earlier version (or point in time, see
+        ``delta.resolve``) and ``version``, or ``None`` if the earlier one is no longer kept.
+        """
+        previous = delta.resolve(since)
+
+        old = None if previous is None else delta.load(previous)
+        new = delta.load(version)
+
+        if old is None or new is None:
+            return None
+
+        return delta.diff(old, new)
+
+    def join(self) -> dict[str, tuple[tuple[t.Any, ...], ...]]:
+        """
+        Builds the export rows for each lease number without modifying any of the parsed data,
+        so it can safely be called again (or from several threads) against the same datasets.
+
+        The area/block rows of a lease are joined to the first of its owner entries only; any
+        further aliquots for the same lease do not repeat them.
+        """
+        index: dict[str, tuple[tuple[t.Any, ...], ...]] = dict()
+
+        area_blocks = self.area_block.parsed_data.decode()
+        leases = self.lease_data.parsed_data.decode()
+
+        for row, owners in self.owner.parsed_data.items():
+            lease, _ = row.split(";")
+
+            if lease in index or lease not in self.area_block.parsed_data:
+                continue
+
+            prefix = (lease.strip(), *self.owner.format_owner(owners))
+            suffix = (
+                *leases[self.lease_data.parsed_data.span(lease)[0]],
+                self.companies.parsed_data[self.lease_operators.parsed_data[lease]],
+            )
+
+            start, stop = self.area_block.parsed_data.span(lease)
+
+            index[lease] = tuple((*prefix, *block, *suffix) for block in area_blocks[start:stop])
+
+        return index
+
+    def iter_csv(
+        self,
+        rows: t.Iterable[t.Sequence[t.Any]] | None = None,
+        compress: bool = False,
+        header: t.Sequence[str] | None = None,
+    ) -> t.Iterator[bytes]:
+        return self.iter_export(name="csv", rows=rows, compress=compress, header=header)
+
+    def iter_export(
+        self,
+        name: str = "csv",
+        rows: t.Iterable[t.Sequence[t.Any]] | None = None,
+        compress: bool = False,
+        header: t.Sequence[str] | None = None,
+        types: t.Sequence[str] | None = None,
+    ) -> t.Iterator[bytes]:
+        """
+        Yields the export in one of ``exports.FORMATS`` in chunks as it is written, optionally
+        gzip compressed on the fly, so it never has to be held in memory in full. A different
+        ``header`` needs the matching column ``types`` for the typed formats.
+        """
+        chunks = exports.FORMATS[name].write(
+            header=self.header_row if header is None else header,
+            types=self.column_types if types is None else types,
+            rows=self.body_rows if rows is None else rows,
+        )
+
+        if not compress:
+            yield from chunks
+            return
+
+        compressor = zlib.compressobj(wbits=31)
+
+        for chunk in chunks:
+            if compressed := compressor.compress(chunk):
+                yield compressed
+
+        yield compressor.flush()
+
+    def formatted_export(
+        self, export: CachedExport, name: str, timeout: float | None = None
+    ) -> CachedExport:
+        """
+        Writes ``export`` in another of the ``exports.FORMATS`` the first time it is asked for,
+        from the same joined rows as its CSV. An export for data that has since been replaced
+        (and written by another worker, so its rows are not at hand) raises ``VersionChanged``
+        rather than being written from the newer rows.
+        """
+        extension = exports.FORMATS[name].extension
+
+        def build() -> CachedExport:
+            with storage.lock("export"):
+                if not export.exists(extension=extension):
+                    index = self.prepared(export.version) if export.index is None else export.index
+                    rows = index.rows()
+
+                    with metrics.stage("WebLeaseWrapper", "export", format=name) as info:
+                        export.write_format(
+                            extension=extension,
+                            chunks=metrics.measured(self.iter_export(name=name, rows=rows), info),
+                        )
+
+            return export
+
+        return self.builds.run(f"export-{export.version}.{extension}", build, timeout)
+
     def send_csv(self) -> BytesIO:
-        with StringIO() as memory_file:
-            memory_csv = csv.writer(memory_file, dialect="excel")
-            memory_csv.writerow(self.header_row)
+        return BytesIO(b"".join(self.iter_csv()))
+
+
+class Refresher:
+    """
+    Keeps the datasets of a WebLeaseWrapper up to date from a background thread, each on the
+    cadence set by its ``delta_days``. Every refresh is prepared on a copy of the dataset, which
+    is only swapped into the wrapper once it has succeeded, and the export is then rebuilt; so
+    requests are always served from the last good data and never wait on BSEE.
+
+    Any other ``tasks`` that keep data up to date (such as the production rollups) are run by
+    name after the datasets on every pass, with their outcome kept in ``status`` alongside them.
+    """
+
+    def __init__(
+        self,
+        wrapper: WebLeaseWrapper,
+        interval: float = 60,
+        tasks: t.Mapping[str, t.Callable[[], t.Any]] | None = None,
+    ) -> None:
+        self.wrapper = wrapper
+        self.interval = interval
+        self.tasks = dict(tasks or {})
+
+        self.status: dict[str, dict[str, t.Any]] = {
+            name: {
+                "last_success": None,
+                "last_error": None,
+                "next_run": None,
+                "duration": None,
+            }
+            for name in [*wrapper.dataset_names, *self.tasks]
+        }
+        self.schedule: dict[str, datetime] = {
+            name: datetime.now() for name in wrapper.dataset_names
+        }
 
-            for row in self.body_rows:
-                memory_csv.writerow(row)
+        # The last failure to rebuild the export, which the loop survives
+        self.export_error: str | None = None
 
-            send = BytesIO()
-            send.write(memory_file.getvalue().encode("UTF-8"))
-            send.seek(0)
+        self.ready = Event()
+        self.stopped = Event()
+        self.thread: Thread | None = None
 
-        return send
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+
+        self.stopped.clear()
+        self.thread = Thread(target=self.run, name="weblease-refresher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                self.refresh_due()
+
+            except Exception as error:  # pylint: disable=broad-except
+                self.export_error = f"{datetime.now().isoformat()}: {error}"
+
+            for name in self.tasks:
+                self.run_task(name)
+
+            self.stopped.wait(self.interval)
+
+    def refresh_due(self) -> None:
+        """
+        Refreshes the datasets that are due, and rebuilds the export if any of them changed (or
+        there is none yet) once every dataset has been prepared at least once.
+        """
+        now = datetime.now()
+
+        try:
+            refreshed = [
+                self.refresh(name)
+                for name in self.wrapper.dataset_names
+                if self.schedule[name] <= now
+            ]
+
+            prepared = all(hasattr(dataset, "parsed_data") for dataset in self.wrapper.datasets())
+
+            if prepared and (any(refreshed) or self.wrapper.cached_export is None):
+                self.wrapper.rebuild_export()
+                self.export_error = None
+
+        finally:
+            self.ready.set()
+
+    def refresh(self, name: str) -> bool:
+        """
+        Prepares a fresh copy of the named dataset and swaps it into the wrapper, returning
+        whether or not that succeeded.
+        """
+        status = self.status[name]
+        dataset = copy.copy(getattr(self.wrapper, name))
+        dataset.location = None
+
+        started = monotonic()
+
+        try:
+            dataset.prepare()
+
+        except Exception as error:  # pylint: disable=broad-except
+            status["last_error"] = f"{datetime.now().isoformat()}: {error}"
+            self.schedule[name] = datetime.now() + timedelta(seconds=self.interval)
+
+            succeeded = False
+
+        else:
+            # Not while a build is preparing or joining the datasets
+            with self.wrapper.build_lock:
+                setattr(self.wrapper, name, dataset)
+
+            status["last_success"] = datetime.now().isoformat()
+            self.schedule[name] = datetime.now() + timedelta(days=dataset.delta_days)
+
+            succeeded = True
+
+        status["duration"] = monotonic() - started
+        status["next_run"] = self.schedule[name].isoformat()
+
+        return succeeded
+
+    def run_task(self, name: str) -> None:
+        status = self.status[name]
+        started = monotonic()
+
+        try:
+            self.tasks[name]()
+
+        except Exception as error:  # pylint: disable=broad-except
+            status["last_error"] = f"{datetime.now().isoformat()}: {error}"
+
+        else:
+            status["last_success"] = datetime.now().isoformat()
+
+        status["duration"] = monotonic() - started
+        status["next_run"] = (datetime.now() + timedelta(seconds=self.interval)).isoformat()
+
+    def export(self, timeout: float | None = None) -> CachedExport | None:
+        """
+        Returns the current export, waiting up to ``timeout`` seconds for the first refresh to
+        finish if it has not yet done so.
+        """
+        self.ready.wait(timeout)
+
+        return self.wrapper.cached_export
+
+
+class FreshnessService:
+    """
+    Fetches and parses each distinct BSEE update page at most once every ``ttl`` seconds, and
+    answers every dataset's ``update_tag``/``update_column`` lookup from that single parse.
+    """
+
+    def __init__(self, ttl: float = 3600) -> None:
+        self.ttl = ttl
+
+        self.pages: dict[str, tuple[float, dict[str, Tag]]] = dict()
+        self.locks: dict[str, Lock] = dict()
+        self.lock = Lock()
+
+    def rows(self, site: str) -> dict[str, "Tag"]:
+        with self.lock:
+            page_lock = self.locks.setdefault(site, Lock())
+
+        with page_lock:
+            cached = self.pages.get(site)
+
+            if cached is None or monotonic() - cached[0] >= self.ttl:
+                cached = (monotonic(), self.fetch(site))
+                self.pages[site] = cached
+
+        return cached[1]
+
+    def fetch(self, site: str) -> dict[str, "Tag"]:
+        # Only needed once a local copy has expired, so it is not imported until then
+        from bs4 import BeautifulSoup  # pylint: disable=import-outside-toplevel
+
+        with urlopen(site, timeout=HTTP_TIMEOUT) as web_page:
+            data = BeautifulSoup(web_page.read(), features="html.parser")
+
+        return {str(tag["id"]): tag for tag in data.find_all(id=True)}
+
+    def lookup(self, site: str, tag: str, column: int) -> str:
+        row = self.rows(site).get(tag)
+
+        if row is None:
+            raise WebLeaseException("Could not find the proper data from WebLease")
+
+        last_date = row.find_all("td")
+
+        try:
+            return str(last_date[column].text)
+
+        except IndexError:
+            raise WebLeaseException("Could not find the proper data from WebLease")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.pages.clear()
+
+
+freshness = FreshnessService()
+
+
+class Field:
+    """
+    One column of a fixed-width record: characters ``start`` up to ``end`` (or to the end of
+    the line, when ``end`` is ``None``), stripped and then converted with ``kind`` if given.
+    A blank value becomes ``null`` instead, when one is given.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        start: int,
+        end: int | None,
+        kind: t.Callable[[str], t.Any] | None = None,
+        null: t.Any = None,
+    ) -> None:
+        self.name = name
+        self.start = start
+        self.end = end
+        self.kind = kind
+        self.null = null
+
+    def column(self) -> t.Callable[[list[str]], t.Iterable[t.Any]]:
+        """
+        Returns a function giving this field's values for a whole list of lines at once, which
+        slices and strips them with ``map`` rather than a line at a time.
+        """
+        pick = itemgetter(slice(self.start, self.end))
+        kind, null = self.kind, self.null
+
+        def values(lines: list[str]) -> t.Iterable[t.Any]:
+            stripped = map(str.strip, map(pick, lines))
+
+            try:
+                if kind is not None and null is not None:
+                    return [kind(value) if value else null for value in stripped]
+
+                if kind is not None:
+                    return list(map(kind, stripped))
+
+            except ValueError as error:
+                raise WebLeaseException(f"Could not read the {self.name} field: {error}")
+
+            if null is not None:
+                return [value or null for value in stripped]
+
+            return stripped
+
+        return values
+
+
+class FixedWidthLayout:
+    """
+    Declares the fields of a fixed-width file once, and extracts them from whole blocks of the
+    raw file at a time. Each block is decoded in one go and every field is then sliced and
+    converted a column at a time, before the columns are zipped back into rows.
+
+    ``blank`` is a range of characters which must be all spaces for a line to be kept.
+    """
+
+    def __init__(
+        self, *fields: Field, blank: tuple[int, int] | None = None, errors: str = "strict"
+    ) -> None:
+        self.fields = fields
+        self.blank = blank
+        self.errors = errors
+
+        self.columns = [field.column() for field in fields]
+
+    def extract(self, lines: list[str]) -> list[tuple[t.Any, ...]]:
+        if self.blank is not None:
+            start, end = self.blank
+            spaces = " " * (end - start)
+
+            lines = [line for line in lines if line[start:end] == spaces]
+
+        return list(zip(*[column(lines) for column in self.columns]))
+
+    def parse(self, blocks: t.Iterable[bytes]) -> t.Iterator[tuple[t.Any, ...]]:
+        for block in blocks:
+            yield from self.parse_block(block)
+
+    def parse_block(self, block: bytes) -> list[tuple[t.Any, ...]]:
+        return self.extract(block.decode(encoding="utf-8", errors=self.errors).split("\n"))
 
 
 class ZipData:
-    location: str
+    location: str | None
     update_tag: str
     update_site: str
     update_column: int
+    parser_version: int = 1
 
     def __init__(self, url: str, filepath: str) -> None:
         self.url = url
         self.filepath = filepath.split("/")
 
+        self.location = None
         self.delta_days = 1
 
     def cache(self) -> None:
         try:
-            with open(file=f"storage/{self.filepath[-1]}.time", mode="r") as time_file:
-                local = datetime.strptime(time_file.read(), "%m/%d/%Y %I:%M:%S %p")
+            with open(file=storage.path(f"{self.filepath[-1]}.time"), mode="r") as time_file:
+                local = datetime.strptime(time_file.read(), TIME_FORMAT)
 
             if datetime.now() - local < timedelta(days=self.delta_days):
                 self.location = "local"
-                self.update = local.strftime("%m/%d/%Y %I:%M:%S %p")
+                self.update = local.strftime(TIME_FORMAT)
 
             else:
                 self.location = "remote"
@@ -115,21 +1091,21 @@ class ZipData:
             self.location = "remote"
             self.update = self.last_update()
 
-    def last_update(self) -> str:
-        with urlopen(self.update_site) as web_page:
-            data = BeautifulSoup(web_page.read(), features="html.parser")
-
-        date = data.find(id=self.update_tag)
-
-        if not isinstance(date, Tag):
-            raise WebLeaseException("Could not find the proper data from WebLease")
-
-        last_date = date.find_all("td")
+        metrics.registry.add(
+            "weblease_cache_total",
+            component=type(self).__name__,
+            stage="cache",
+            result="hit" if self.location == "local" else "miss",
+        )
 
-        return str(last_date[self.update_column].text)
+    def last_update(self) -> str:
+        with metrics.stage(type(self).__name__, "last_update"):
+            return freshness.lookup(
+                site=self.update_site, tag=self.update_tag, column=self.update_column
+            )
 
     def get_data(self) -> None:
-        if self.location == None:
+        if self.location is None:
             self.cache()
 
         if self.location == "local":
@@ -139,49 +1115,252 @@ class ZipData:
             self.get_remote_data()
 
     def get_remote_data(self) -> None:
-        with urlopen(url=self.url) as web_file:
-            if web_file.status == 200:
-                zip_archive = BytesIO(web_file.read())
+        if not self.download():
+            self.revalidate()
+            self.get_local_data()
 
-            else:
-                raise WebLeaseException(
-                    "Error downloading file. Please check the URL or try again later."
-                )
+            return
+
+        part = storage.path(f"{self.filepath[-1]}.part")
 
         try:
-            self.data_file = (
-                zipfile.ZipFile(file=zip_archive).open(name="/".join(self.filepath)).read()
-            )
+            with metrics.stage(type(self).__name__, "extract") as info:
+                with zipfile.ZipFile(file=part) as archive:
+                    with archive.open(name="/".join(self.filepath)) as member:
+                        self.save_data_locally(member)
+
+                info["bytes_read"] = os.path.getsize(part)
+                info["bytes_written"] = os.path.getsize(storage.path(self.filepath[-1]))
 
         except FileNotFoundError:
             raise WebLeaseException("The URL does not lead to a file")
 
         except zipfile.BadZipfile:
+            os.remove(part)
             raise WebLeaseException("The URL does not lead to a valid zip file")
 
         except KeyError:
             raise WebLeaseException("The URL does not lead to a valid zip file")
 
-        self.save_data_locally()
+        os.replace(f"{part}.http", storage.path(f"{self.filepath[-1]}.http"))
+        os.remove(part)
+
+        self.get_local_data()
+
+    def download(self) -> bool:
+        """
+        Downloads the archive to ``<file>.part`` in storage, resuming an interrupted download
+        with a ``Range`` request where the server allows it and retrying with a bounded backoff.
+
+        Returns ``False`` without downloading anything if the server reports that the archive
+        has not changed (HTTP 304) since the copy already in storage was fetched.
+        """
+        part = storage.path(f"{self.filepath[-1]}.part")
+
+        with metrics.stage(type(self).__name__, "download", bytes_fetched=0) as info:
+            for attempt in range(HTTP_RETRIES):
+                if attempt > 0:
+                    sleep(min(HTTP_BACKOFF * 2 ** (attempt - 1), HTTP_MAX_BACKOFF))
+
+                try:
+                    request = Request(url=self.url, headers=self.request_headers())
+
+                    with urlopen(request, timeout=HTTP_TIMEOUT) as web_file:
+                        if web_file.status not in (200, 206):
+                            raise WebLeaseException(
+                                "Error downloading file. Please check the URL or try again later."
+                            )
+
+                        resumed = web_file.status == 206
+
+                        if not resumed:
+                            with storage.atomic_write(
+                                f"{self.filepath[-1]}.part.http", "w"
+                            ) as save:
+                                json.dump(validators(web_file.headers), save)
+
+                        with open(file=part, mode="ab" if resumed else "wb") as part_file:
+                            offset = part_file.tell()
+                            shutil.copyfileobj(web_file, part_file, CHUNK_SIZE)
+                            info["bytes_fetched"] += part_file.tell() - offset
+
+                        expected = expected_size(web_file.headers, resumed)
+
+                    if expected is None or os.path.getsize(part) == expected:
+                        info["cache"] = "miss"
+                        return True
+
+                except HTTPError as error:
+                    if error.code == 304:
+                        info["cache"] = "hit"
+                        return False
+
+                    if error.code == 416:
+                        os.remove(part)
+
+                    elif error.code < 500 and error.code != 429:
+                        raise WebLeaseException(
+                            "Error downloading file. Please check the URL or try again later."
+                        )
+
+                except (URLError, HTTPException, OSError):
+                    pass
+
+            raise WebLeaseException(
+                "Error downloading file. Please check the URL or try again later."
+            )
+
+    def request_headers(self) -> dict[str, str]:
+        """
+        Validators for the copy in storage make the request conditional, and those of a partial
+        download let it resume from where it stopped (provided the archive has not changed).
+        """
+        headers: dict[str, str] = dict()
+
+        if os.path.exists(storage.path(self.filepath[-1])):
+            saved = load_validators(storage.path(f"{self.filepath[-1]}.http"))
+
+            if etag := saved.get("etag"):
+                headers["If-None-Match"] = etag
+
+            if last_modified := saved.get("last_modified"):
+                headers["If-Modified-Since"] = last_modified
+
+        part = storage.path(f"{self.filepath[-1]}.part")
+        partial = load_validators(f"{part}.http")
+
+        if os.path.exists(part) and (partial.get("etag") or partial.get("last_modified")):
+            headers["Range"] = f"bytes={os.path.getsize(part)}-"
+            headers["If-Range"] = str(partial.get("etag") or partial["last_modified"])
+
+        return headers
+
+    def revalidate(self) -> None:
+        """
+        The archive has not changed, so only the update stamp is moved on; the snapshot parsed
+        from the same data is carried over to the new stamp rather than being parsed again.
+        """
+        with open(file=storage.path(f"{self.filepath[-1]}.time"), mode="r") as time_file:
+            previous = time_file.read()
+
+        parsed_data = storage.load_snapshot(
+            f"{self.filepath[-1]}.snapshot", self.snapshot_key(update=previous)
+        )
+
+        with storage.atomic_write(f"{self.filepath[-1]}.time", mode="w") as save_file:
+            save_file.write(self.update)
+
+        if parsed_data is not None:
+            self.parsed_data = parsed_data
+            self.save_snapshot()
 
     def get_local_data(self) -> None:
-        with open(file=f"storage/{self.filepath[-1]}", mode="rb") as local_file:
-            self.data_file = local_file.read()
+        self.data_path = storage.path(self.filepath[-1])
 
-    def save_data_locally(self) -> None:
-        with open(file=f"storage/{self.filepath[-1]}", mode="wb") as save_file:
-            save_file.write(self.data_file)
+    def save_data_locally(self, member: t.IO[bytes]) -> None:
+        with storage.atomic_write(self.filepath[-1]) as save_file:
+            shutil.copyfileobj(member, save_file, CHUNK_SIZE)
 
-        with open(file=f"storage/{self.filepath[-1]}.time", mode="w") as save_file:
+        with storage.atomic_write(f"{self.filepath[-1]}.time", mode="w") as save_file:
             save_file.write(self.update)
 
+    def blocks(self) -> t.Iterator[bytes]:
+        """
+        Yields the raw local data file a block of whole lines at a time (roughly ``CHUNK_SIZE``
+        bytes each, without the final newline), so the parsers never need all of it in memory.
+        """
+        remainder = b""
+
+        with open(file=self.data_path, mode="rb") as local_file:
+            while chunk := local_file.read(CHUNK_SIZE):
+                block, newline, remainder = (remainder + chunk).rpartition(b"\n")
+
+                if newline:
+                    yield block
+
+        if remainder:
+            yield remainder
+
+    def lines(self, errors: str = "strict") -> t.Iterator[str]:
+        for block in self.blocks():
+            yield from block.decode(encoding="utf-8", errors=errors).split("\n")
+
     def load_data(self) -> None:
-        self.data = list(csv.DictReader(f=self.data_file.decode().split("\n")))
+        self.data: t.Iterable[t.Any] = csv.DictReader(f=self.lines())
+
+    def snapshot_key(self, update: str | None = None) -> str:
+        """
+        Identifies the parsed data by its source file, the BSEE update stamp (the current one,
+        unless another is given) and the version of both the snapshot format and this dataset's
+        parser.
+        """
+        update = self.update if update is None else update
+
+        try:
+            stamp = datetime.strptime(update, TIME_FORMAT).strftime(TIME_FORMAT)
+
+        except ValueError:
+            stamp = update
+
+        return f"{SNAPSHOT_VERSION};{'/'.join(self.filepath)};{stamp};{self.parser_version}"
+
+    def load_snapshot(self) -> bool:
+        name = f"{self.filepath[-1]}.snapshot"
+
+        with metrics.stage(type(self).__name__, "snapshot_load") as info:
+            parsed_data = storage.load_snapshot(name, self.snapshot_key())
+            info["cache"] = "miss" if parsed_data is None else "hit"
+
+            if parsed_data is None:
+                return False
+
+            info["bytes_read"] = os.path.getsize(storage.path(name))
+
+        self.parsed_data = parsed_data
+
+        return True
+
+    def save_snapshot(self) -> None:
+        name = f"{self.filepath[-1]}.snapshot"
+
+        with metrics.stage(type(self).__name__, "snapshot_save") as info:
+            storage.save_snapshot(name, self.snapshot_key(), self.parsed_data)
+            info["bytes_written"] = os.path.getsize(storage.path(name))
+
+    def memory_usage(self) -> int:
+        return sizeof(getattr(self, "parsed_data", None))
 
     def prepare(self) -> None:
-        self.get_data()
-        self.load_data()
-        self.parse_data()
+        """
+        Loads the parsed snapshot for the current update stamp if one exists (whether or not the
+        local copy has expired), otherwise fetches and parses the data. Only one thread or worker
+        does the latter for a given file at a time; the rest wait and then load its snapshot.
+        """
+        if self.location is None:
+            self.cache()
+
+        if self.load_snapshot():
+            return
+
+        with storage.lock(self.filepath[-1]):
+            if self.load_snapshot():
+                return
+
+            self.get_data()
+
+            # An archive the server reports unchanged keeps the snapshot parsed from it before
+            if self.load_snapshot():
+                return
+
+            # Loading is lazy, so it is timed (and its rows counted) as part of the parse
+            with metrics.stage(type(self).__name__, "parse") as info:
+                info["bytes_read"] = os.path.getsize(storage.path(self.filepath[-1]))
+
+                self.load_data()
+                self.data = metrics.counted(self.data, info)
+                self.parse_data()
+
+            self.save_snapshot()
 
     @abc.abstractmethod
     def parse_data(self) -> None:
@@ -189,7 +1368,13 @@ class ZipData:
 
 
 class LeaseData(ZipData):
-    def __init__(self) -> None:
+    parser_version = 2
+
+    def __init__(self, calendar_terms: bool = False) -> None:
+        """
+        Leases without an expiration date expire ``primary_term`` years after they take effect;
+        ``calendar_terms`` counts those as calendar years rather than as 365 days each.
+        """
         super().__init__(
             url="https://www.data.boem.gov/Leasing/Files/lsetapefixed.zip",
             filepath="LSETAPE.DAT",
@@ -201,49 +1386,64 @@ class LeaseData(ZipData):
 
         self.delta_days = 7
 
+        self.layout = FixedWidthLayout(
+            Field(name="lease", start=0, end=7),
+            Field(name="sale_num", start=16, end=23, null="N/A"),
+            Field(name="effective_date", start=50, end=58),
+            Field(name="primary_term", start=58, end=60),
+            Field(name="expiration_date", start=60, end=68),
+            Field(name="bid_amount", start=122, end=135, kind=float, null="N/A"),
+        )
+
+        self.calendar_terms = calendar_terms
+
+    def snapshot_key(self, update: str | None = None) -> str:
+        key = super().snapshot_key(update)
+
+        return f"{key};calendar" if self.calendar_terms else key
+
     def load_data(self) -> None:
-        self.data = [
-            [
-                row[:7].strip(),
-                row[16:23].strip(),
-                row[50:58].strip(),
-                row[58:60].strip(),
-                row[60:68].strip(),
-                row[122:135].strip(),
-            ]
-            for row in self.data_file.decode().split("\n")
-        ]
+        self.data = self.layout.parse(self.blocks())
 
     def parse_data(self) -> None:
-        self.parsed_data = dict()
+        parsed_data: dict[str, list[tuple[t.Any, ...]]] = dict()
 
         for row in self.data:
             if len(row[4]) != 0:
-                exp_date = datetime.strptime(row[4], "%Y%m%d")
-                output_date = exp_date.strftime("%m/%d/%Y")
+                output_date = dates.reformat(row[4])
+
+            elif len(row[2]) != 0:
+                output_date = dates.expiration(row[2], row[3], self.calendar_terms)
 
             else:
-                if len(row[2]) != 0:
-                    exp_date = datetime.strptime(row[2], "%Y%m%d") + timedelta(
-                        days=365 * int(row[3])
-                    )
-                    output_date = exp_date.strftime("%m/%d/%Y")
-                else:
-                    output_date = "N/A"
-
-            self.parsed_data[row[0]] = [
-                # u'sale_num':
-                string_ifelse(row[1]),
-                # u'primary_term':
-                int_ifelse(row[3]),
-                # u'exp_date':
-                output_date,
-                # u'bid_amount':
-                float_ifelse(row[5]),
+                output_date = "N/A"
+
+            parsed_data[row[0]] = [
+                (
+                    # u'sale_num':
+                    row[1],
+                    # u'primary_term':
+                    int_ifelse(row[3]),
+                    # u'exp_date':
+                    output_date,
+                    # u'bid_amount':
+                    row[5],
+                )
             ]
 
+        self.parsed_data = Table.from_groups(
+            parsed_data,
+            Column(name="sale_num"),
+            Column(name="primary_term", typecode="i", null="N/A"),
+            Column(name="exp_date"),
+            Column(name="bid_amount", typecode="d", null="N/A"),
+            unique=True,
+        )
+
 
 class LabData(ZipData):
+    parser_version = 2
+
     def __init__(self) -> None:
         super().__init__(
             url="https://www.data.bsee.gov/Leasing/Files/LABRawData.zip",
@@ -255,25 +1455,35 @@ class LabData(ZipData):
         self.update_column = 2
 
     def parse_data(self) -> None:
-        self.parsed_data: dict[str, list[str, str, str, int]] = dict()
+        parsed_data: dict[str, list[tuple[str, str, str, int]]] = dict()
 
         for row in self.data:
-            row_data = [
+            row_data = (
                 f'{row["AREA_CODE"]}{row["BLOCK_NUM"]}',
                 row["LEASE_STATUS_CD"],
                 row["LEASE_EFF_DATE"],
                 # row[u'LEASE_EXPIR_DATE'],
                 int(row["BLK_MAX_WTR_DPTH"]),
-            ]
+            )
 
             try:
-                self.parsed_data[f"{row['LEASE_NUMBER'].strip()}"].append(row_data)
+                parsed_data[f"{row['LEASE_NUMBER'].strip()}"].append(row_data)
 
             except KeyError:
-                self.parsed_data[f"{row['LEASE_NUMBER'].strip()}"] = [row_data]
+                parsed_data[f"{row['LEASE_NUMBER'].strip()}"] = [row_data]
+
+        self.parsed_data = Table.from_groups(
+            parsed_data,
+            Column(name="block_num"),
+            Column(name="lease_status"),
+            Column(name="lease_eff_date"),
+            Column(name="max_water_depth", typecode="i"),
+        )
 
 
 class OwnerData(ZipData):
+    parser_version = 2
+
     def __init__(self) -> None:
         super().__init__(
             url="https://www.data.bsee.gov/Leasing/Files/LeaseOwnerRawData.zip",
@@ -285,29 +1495,27 @@ class OwnerData(ZipData):
         self.update_column = 2
 
     def parse_data(self) -> None:
-        self.parsed_data = dict()
+        parsed_data: dict[str, list[tuple[str, float]]] = dict()
 
         for row in self.data:
-            row_data = {
-                "owner": row["BUS_ASC_NAME"],
-                "percentage": float(row["ASSIGNMENT_PCT"]),
-            }
+            row_data = (row["BUS_ASC_NAME"], float(row["ASSIGNMENT_PCT"]))
+
+            key = "{lease};{aliquot}".format(
+                lease=row["LEASE_NUMBER"].strip(),
+                aliquot=row["OWNER_ALIQUOT_CD"] if row["OWNER_ALIQUOT_CD"] != "1" else "",
+            )
 
             try:
-                self.parsed_data[
-                    "{lease};{aliquot}".format(
-                        lease=row["LEASE_NUMBER"].strip(),
-                        aliquot=row["OWNER_ALIQUOT_CD"] if row["OWNER_ALIQUOT_CD"] != "1" else "",
-                    )
-                ].append(row_data)
+                parsed_data[key].append(row_data)
 
             except KeyError:
-                self.parsed_data[
-                    "{lease};{aliquot}".format(
-                        lease=row["LEASE_NUMBER"].strip(),
-                        aliquot=row["OWNER_ALIQUOT_CD"] if row["OWNER_ALIQUOT_CD"] != "1" else "",
-                    )
-                ] = [row_data]
+                parsed_data[key] = [row_data]
+
+        self.parsed_data = Table.from_groups(
+            parsed_data,
+            Column(name="owner"),
+            Column(name="percentage", typecode="d"),
+        )
 
     def format_owner(self, lease: list) -> list:
         """
@@ -319,11 +1527,11 @@ class OwnerData(ZipData):
         However, the actual values returned are also made to look pretty, in the format shown
         in the function "format_string" below.
         """
-        lease.sort(key=lambda company: company["percentage"], reverse=True)
+        owners = sorted(lease, key=lambda company: company["percentage"], reverse=True)
 
-        operator = self.format_string(lease.pop(0))
+        operator = self.format_string(owners[0])
 
-        others = ", ".join([self.format_string(company) for company in lease])
+        others = ", ".join([self.format_string(company) for company in owners[1:]])
 
         return [operator, others]
 
@@ -352,21 +1560,39 @@ class CompanyNumberToName(ZipData):
 
         self.delta_days = 7
 
-    def load_data(self) -> None:
-        self.data_file = self.data_file.decode(encoding="utf-8", errors="ignore").replace(
-            ", \nLLC", ",  LLC"
+        self.layout = FixedWidthLayout(
+            Field(name="num", start=0, end=5),
+            Field(name="name", start=13, end=113),
+            blank=(213, 221),
+            errors="ignore",
         )
-        self.data = [
-            {
-                "num": row[:5].strip(),
-                "name": row[13:113].strip(),
-            }
-            for row in self.data_file.split("\n")
-            if row[213:221] == "        "
-        ]
+
+    def blocks(self) -> t.Iterator[bytes]:
+        """
+        Some company names are split over two lines as "..., " and "LLC"; those lines are joined
+        back together (as "...,  LLC") before they are handed to the parser. A block ending in
+        ", " holds its last line back, in case the next block starts with "LLC".
+        """
+        held = b""
+
+        for block in super().blocks():
+            block = (held + b"\n" + block if held else block).replace(b", \nLLC", b",  LLC")
+            held = b""
+
+            if block.endswith(b", "):
+                block, _, held = block.rpartition(b"\n")
+
+            if block:
+                yield block
+
+        if held:
+            yield held
+
+    def load_data(self) -> None:
+        self.data = self.layout.parse(self.blocks())
 
     def parse_data(self) -> None:
-        self.parsed_data = {entry["num"]: entry["name"] for entry in self.data}
+        self.parsed_data = {num: name for num, name in self.data}
 
 
 class LeaseNumberToOperator(ZipData):
@@ -382,70 +1608,63 @@ class LeaseNumberToOperator(ZipData):
 
         self.delta_days = 1
 
+        self.layout = FixedWidthLayout(
+            Field(name="lease", start=0, end=7),
+            Field(name="start_date", start=7, end=15),
+            Field(name="end_date", start=41, end=49),
+            Field(name="operator", start=49, end=None, null="NONE"),
+            errors="ignore",
+        )
+
     def load_data(self) -> None:
-        self.data_file = self.data_file.decode(encoding="utf-8", errors="ignore")
-        self.data = [
-            {
-                "lease": row[:7].strip(),
-                "operator": row[49:].strip(),
-                "date": max([self.int_ifelse(row[7:15]), self.int_ifelse(row[41:49])]),
-            }
-            for row in self.data_file.split("\n")
-        ]
+        self.data = self.layout.parse(self.blocks())
 
     def parse_data(self) -> None:
-        parsed_data: dict[str, dict[str, str]] = dict()
-
-        for row in self.data:
-            if row["lease"] not in parsed_data.keys():
-                parsed_data[row["lease"]] = {
-                    "operator": self.clean_operator(row["operator"]),
-                    "date": row["date"],
-                }
+        parsed_data: dict[str, tuple[str, str]] = dict()
 
-            else:
-                if row["date"] > parsed_data[row["lease"]]["date"]:
-                    parsed_data[row["lease"]] = {
-                        "operator": self.clean_operator(row["operator"]),
-                        "date": row["date"],
-                    }
-
-        self.parsed_data = {entry: parsed_data[entry]["operator"] for entry in parsed_data.keys()}
+        # The dates are fixed-width YYYYMMDD strings (or blank), so they compare the same way as
+        # the dates themselves without being converted.
+        for lease, start_date, end_date, operator in self.data:
+            latest = max(start_date, end_date)
 
-    def int_ifelse(self, value: str) -> int:
-        if len(value.strip()) == 0:
-            return 0
+            if lease not in parsed_data or latest > parsed_data[lease][0]:
+                parsed_data[lease] = (latest, operator)
 
-        else:
-            return int(value)
+        self.parsed_data = {
+            lease: sys.intern(operator) for lease, (_, operator) in parsed_data.items()
+        }
 
-    def clean_operator(self, value: str) -> str:
-        if len(value.strip()) == 0:
-            return "NONE"
 
-        else:
-            return value
+def validators(headers: Message) -> dict[str, str | None]:
+    return {"etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
 
 
-def int_ifelse(file_value: t.Any) -> str | int:
-    if len(file_value) != 0:
-        return int(file_value)
+def load_validators(path: str) -> dict[str, str | None]:
+    try:
+        with open(file=path, mode="r") as validator_file:
+            return dict(json.load(validator_file))
 
-    else:
-        return "N/A"
+    except (OSError, ValueError):
+        return dict()
 
 
-def float_ifelse(file_value: t.Any) -> str | float:
-    if len(file_value) != 0:
-        return float(file_value)
+def expected_size(headers: Message, resumed: bool) -> int | None:
+    """
+    The full size of the archive once the response has been written out, taken from the
+    ``Content-Range`` of a resumed download or the ``Content-Length`` of a complete one.
+    """
+    if resumed:
+        total = str(headers.get("Content-Range", "")).rpartition("/")[2]
 
     else:
-        return "N/A"
+        total = str(headers.get("Content-Length", ""))
 
+    return int(total) if total.isdigit() else None
 
-def string_ifelse(file_value: t.Any) -> str:
+
+def int_ifelse(file_value: t.Any) -> str | int:
     if len(file_value) != 0:
-        return str(file_value)
+        return int(file_value)
 
     else:
         return "N/A"
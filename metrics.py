@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import json
+import typing as t
+import logging
+import resource
+from time import monotonic
+from threading import Lock
+from contextlib import contextmanager
+
+logger = logging.getLogger("weblease")
+
+# The counts a stage can report through its ``info``, and the metric each one is added to.
+COUNTERS = {
+    "bytes_fetched": "weblease_fetched_bytes_total",
+    "bytes_read": "weblease_read_bytes_total",
+    "bytes_written": "weblease_written_bytes_total",
+}
+
+# The fields of a stage's ``info`` that also label its metrics, such as the format of an export.
+LABELS = ("format",)
+
+
+def peak_rss() -> int:
+    """
+    The peak resident set size of this process so far, in bytes.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Registry:
+    """
+    Collects the measurements of every stage, and renders them in the Prometheus text format.
+    Each metric is keyed by its name and a tuple of its label pairs.
+    """
+
+    def __init__(self) -> None:
+        self.lock = Lock()
+
+        self.counters: dict[tuple[str, tuple[tuple[str, str], ...]], float] = dict()
+        self.gauges: dict[tuple[str, tuple[tuple[str, str], ...]], float] = dict()
+
+    def add(self, name: str, value: float = 1, /, **labels: str) -> None:
+        key = (name, tuple(sorted(labels.items())))
+
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, /, **labels: str) -> None:
+        with self.lock:
+            self.gauges[(name, tuple(sorted(labels.items())))] = value
+
+    def record(self, component: str, stage: str, seconds: float, info: dict[str, t.Any]) -> None:
+        labels = {"component": component, "stage": stage}
+        labels.update((key, str(info[key])) for key in LABELS if key in info)
+
+        self.add("weblease_stage_duration_seconds_count", **labels)
+        self.add("weblease_stage_duration_seconds_sum", seconds, **labels)
+        self.set("weblease_stage_last_duration_seconds", seconds, **labels)
+        self.set("weblease_stage_peak_rss_bytes", info["peak_rss_bytes"], **labels)
+
+        for key, name in COUNTERS.items():
+            if key in info:
+                self.add(name, info[key], **labels)
+
+        if "rows" in info:
+            self.set("weblease_stage_rows", info["rows"], **labels)
+
+        if "cache" in info:
+            self.add("weblease_cache_total", component=component, stage=stage, result=info["cache"])
+
+        if "error" in info:
+            self.add("weblease_stage_errors_total", **labels)
+
+    def durations(self) -> dict[tuple[str, str], tuple[int, float]]:
+        """
+        How many times each ``(component, stage)`` has run so far, and for how long in total,
+        whatever its other labels.
+        """
+        durations: dict[tuple[str, str], tuple[int, float]] = dict()
+
+        with self.lock:
+            for (name, labels), count in self.counters.items():
+                if name == "weblease_stage_duration_seconds_count":
+                    label = dict(labels)
+                    key = (label["component"], label["stage"])
+                    runs, total = durations.get(key, (0, 0.0))
+
+                    durations[key] = (
+                        runs + int(count),
+                        total + self.counters[("weblease_stage_duration_seconds_sum", labels)],
+                    )
+
+        return durations
+
+    def render(self) -> str:
+        self.set("weblease_process_peak_rss_bytes", peak_rss())
+
+        lines = list()
+
+        with self.lock:
+            for kind, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                names = sorted({name for name, _ in metrics})
+
+                for name in names:
+                    if name.endswith("_count"):
+                        lines.append(f"# TYPE {name[:-len('_count')]} summary")
+
+                    elif not name.endswith("_sum"):
+                        lines.append(f"# TYPE {name} {kind}")
+
+                    for (metric, labels), value in sorted(metrics.items()):
+                        if metric == name:
+                            lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def format_labels(labels: tuple[tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+registry = Registry()
+
+
+@contextmanager
+def stage(component: str, name: str, **fields: t.Any) -> t.Iterator[dict[str, t.Any]]:
+    """
+    Times one stage of ``component``, and then records it to the registry and logs it as a
+    single JSON line. The stage can add its own counts (rows, bytes, cache result, ...) to the
+    ``info`` it is given; an exception is recorded as an error and raised again.
+    """
+    info: dict[str, t.Any] = dict(fields)
+    started = monotonic()
+
+    try:
+        yield info
+
+    except BaseException as error:
+        info["error"] = f"{type(error).__name__}: {error}"
+        raise
+
+    finally:
+        seconds = monotonic() - started
+        info["peak_rss_bytes"] = peak_rss()
+
+        registry.record(component, name, seconds, info)
+
+        logger.info(
+            json.dumps(
+                {"event": "stage", "component": component, "stage": name, "seconds": seconds}
+                | info,
+                default=str,
+            )
+        )
+
+
+def counted(rows: t.Iterable[t.Any], info: dict[str, t.Any]) -> t.Iterator[t.Any]:
+    """
+    Passes ``rows`` through, counting them into ``info["rows"]`` as they go by.
+    """
+    info["rows"] = info.get("rows", 0)
+
+    for row in rows:
+        info["rows"] += 1
+        yield row
+
+
+def measured(chunks: t.Iterable[bytes], info: dict[str, t.Any]) -> t.Iterator[bytes]:
+    """
+    Passes ``chunks`` through, adding their size to ``info["bytes_written"]``.
+    """
+    info["bytes_written"] = info.get("bytes_written", 0)
+
+    for chunk in chunks:
+        info["bytes_written"] += len(chunk)
+        yield chunk
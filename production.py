@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Monthly and cumulative oil, gas and water production rolled up by field, by area/block and by
+lease, from BSEE's OGOR-A production archives and its deepwater field list.
+"""
+
+import csv
+import json
+import typing as t
+import hashlib
+from math import inf
+from time import monotonic
+from datetime import date
+from email.utils import parsedate_to_datetime
+from http.client import HTTPException
+from urllib.error import URLError
+from urllib.request import Request, urlopen
+from concurrent.futures import ThreadPoolExecutor
+
+import lease
+import metrics
+import storage
+from columnar import Table, Column
+
+# The OGOR-A columns used: the lease, the production month (YYYYMM), the oil, gas and water
+# volumes, and the area/block. The notebook in jupyter/ reads the same archives on its own: it
+# has to run in a bare Jupyter kernel without this app, and keeps every well-zone (and its
+# production days) where the rollups only need each lease's blocks, so neither can be built
+# from the other's store.
+LEASE, MONTH, OIL, GAS, WATER, BLOCK_NUM = 0, 2, 5, 6, 7, 10
+
+# Fields are matched to the blocks they cover, and both to the blocks each lease produced from.
+DIMENSIONS = ("field", "block", "lease")
+
+COLUMNS = ("month", "oil", "gas", "water", "cumulative_oil", "cumulative_gas", "cumulative_water")
+
+# The optional columns of the lease export, with each lease's production since the first month
+# the rollups cover.
+EXPORT_HEADER = [
+    "Lease Cumulative Oil since {since} (bbl)",
+    "Lease Cumulative Gas since {since} (Mcf)",
+    "Lease Cumulative Water since {since} (bbl)",
+]
+EXPORT_TYPES = ["int", "int", "int"]
+
+SNAPSHOT = "production.snapshot"
+
+# Bump whenever the shape of the rollups changes.
+ROLLUP_VERSION = 2
+
+# The first year BSEE publishes an OGOR-A archive for.
+FIRST_YEAR = 1996
+
+# A closed year whose archive cannot be checked or fetched (last year's, early in January, is
+# often not published yet) is left out of the rollups, and only tried again after this long.
+MISSING_RETRY = 24 * 60 * 60
+
+
+def normalise(name: str) -> str:
+    """
+    Fields, blocks and leases are looked up without regard to case or spacing, which also makes
+    the padded blocks of the production files ("GC  640") match LabData's ``AREA_CODE``
+    followed by ``BLOCK_NUM`` ("GC640").
+    """
+    return "".join(name.split()).upper()
+
+
+def volume(value: str) -> int:
+    """
+    Volumes are whole numbers, though now and then one is written with a decimal point; a blank
+    volume is none at all.
+    """
+    try:
+        return int(value) if value else 0
+
+    except ValueError:
+        return round(float(value))
+
+
+def month_number(text: str) -> int:
+    """
+    Reads a YYYY-MM month as the YYYYMM number the rollups are kept by.
+    """
+    year, month = text.split("-")
+
+    if len(year) != 4 or not 1 <= int(month) <= 12:
+        raise ValueError(f"{text} is not a YYYY-MM month")
+
+    return int(year) * 100 + int(month)
+
+
+def month_label(month: int) -> str:
+    return f"{month // 100:04d}-{month % 100:02d}"
+
+
+def parse_years(text: str) -> list[int]:
+    """
+    The closed years given as a comma separated list of years and ranges ("2015-2018,2020"), or
+    every closed year since ``FIRST_YEAR`` when none are given, so that the cumulative totals
+    are totals to date.
+    """
+    if not text.strip():
+        return list(range(FIRST_YEAR, date.today().year))
+
+    years: set[int] = set()
+
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        first, _, last = part.partition("-")
+        years.update(range(int(first), int(last or first) + 1))
+
+    return sorted(years)
+
+
+class ProductionArchive(lease.ZipData):
+    """
+    A BSEE archive that has no row on the update pages; its stamp is the ``Last-Modified`` date
+    the server gives for it instead.
+    """
+
+    def __init__(self, url: str, filepath: str) -> None:
+        super().__init__(url=url, filepath=filepath)
+
+        # When the server was last asked, and the stamp it gave
+        self.checked: tuple[float, str] | None = None
+
+    def last_update(self) -> str:
+        """
+        Asks the server at most once every ``delta_days``. The stamp is the date the archive
+        last changed, which for a closed year is long past, so the local copy always looks
+        expired; without this, the server would be asked again on every check.
+        """
+        ttl = self.delta_days * 24 * 60 * 60
+
+        if self.checked is not None and monotonic() - self.checked[0] < ttl:
+            return self.checked[1]
+
+        with metrics.stage(type(self).__name__, "last_update"):
+            try:
+                request = Request(url=self.url, method="HEAD")
+
+                with urlopen(request, timeout=lease.HTTP_TIMEOUT) as response:
+                    modified = response.headers.get("Last-Modified")
+
+            except (URLError, HTTPException, OSError):
+                raise lease.WebLeaseException(f"Could not check {self.url} for updates")
+
+            try:
+                update = parsedate_to_datetime(modified).strftime(lease.TIME_FORMAT)
+
+            except (TypeError, ValueError):
+                raise lease.WebLeaseException(f"{self.url} does not say when it was last updated")
+
+        self.checked = (monotonic(), update)
+
+        return update
+
+    def load_data(self) -> None:
+        self.data = csv.reader(self.lines())
+
+
+class ProductionData(ProductionArchive):
+    """
+    The OGOR-A production of one closed ``year``, or of the current year when none is given,
+    summed per lease into the production of each of its blocks in each month.
+    """
+
+    def __init__(self, year: int | None = None) -> None:
+        name = "ogoradelimit" if year is None else f"ogora{year}delimit"
+
+        super().__init__(
+            url=f"https://www.data.bsee.gov/Production/Files/{name}.zip",
+            filepath=f"{name}.txt",
+        )
+
+        self.year = year
+
+        # A closed year is only corrected now and then.
+        self.delta_days = 1 if year is None else 30
+
+    def parse_data(self) -> None:
+        leases: dict[str, dict[tuple[str, int], list[int]]] = dict()
+
+        for row in self.data:
+            if len(row) <= BLOCK_NUM:
+                continue
+
+            months = leases.setdefault(normalise(row[LEASE]), dict())
+            totals = months.setdefault((normalise(row[BLOCK_NUM]), int(row[MONTH])), [0, 0, 0])
+
+            totals[0] += volume(row[OIL])
+            totals[1] += volume(row[GAS])
+            totals[2] += volume(row[WATER])
+
+        self.parsed_data = Table.from_groups(
+            {
+                number: [(block, month, *totals) for (block, month), totals in months.items()]
+                for number, months in leases.items()
+            },
+            Column(name="block_num"),
+            Column(name="month", typecode="i"),
+            Column(name="oil", typecode="q"),
+            Column(name="gas", typecode="q"),
+            Column(name="water", typecode="q"),
+        )
+
+
+class FieldData(ProductionArchive):
+    """
+    The deepwater fields, as the name of the field each block belongs to.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(
+            url="https://www.data.bsee.gov/Other/Files/DeepQualRawData.zip",
+            filepath="DeepQualRawData/mv_deep_water_field_leases.txt",
+        )
+
+        self.delta_days = 7
+
+    def parse_data(self) -> None:
+        rows = iter(self.data)
+
+        # The header
+        next(rows, None)
+
+        self.parsed_data = {normalise(row[2] + row[3]): row[0].strip() for row in rows if row}
+
+
+class Rollups:
+    """
+    The production of every field, block and lease month by month, each with its running
+    totals: one Table per dimension, keyed by the normalised name, with a row of ``COLUMNS`` for
+    each month it produced in, in order.
+    """
+
+    def __init__(self, version: str, tables: dict[str, Table], names: dict[str, str]) -> None:
+        self.version = version
+        self.tables = tables
+
+        # The field names as BSEE writes them; blocks and leases are shown as normalised.
+        self.names = names
+
+        # The first month any production was reported for, which the cumulative totals run from
+        months = tables["lease"].columns[0]
+        self.since = month_label(min(months.values)) if len(months) else None
+
+    @classmethod
+    def build(
+        cls, version: str, archives: t.Sequence[Table], fields: t.Mapping[str, str]
+    ) -> "Rollups":
+        """
+        Rolls the archives (oldest first) up. A lease's month reported again in a later archive
+        replaces what the earlier one said about it, rather than being added to it.
+        """
+        monthly: dict[str, dict[str, dict[int, list[int]]]] = {name: dict() for name in DIMENSIONS}
+        rows = [archive.decode() for archive in archives]
+
+        for number in sorted({number for archive in archives for number in archive}):
+            reported: dict[tuple[str, int], tuple[int, ...]] = dict()
+
+            for archive, decoded in zip(archives, rows):
+                if number in archive:
+                    start, stop = archive.span(number)
+
+                    for block, month, *volumes in decoded[start:stop]:
+                        reported[(block, month)] = tuple(volumes)
+
+            for (block, month), production in reported.items():
+                field = fields.get(block)
+
+                for dimension, name in (("field", field), ("block", block), ("lease", number)):
+                    if name is None:
+                        continue
+
+                    totals = monthly[dimension].setdefault(normalise(name), dict())
+                    totals[month] = [
+                        total + value
+                        for total, value in zip(totals.get(month, (0, 0, 0)), production)
+                    ]
+
+        tables = {
+            dimension: Table.from_groups(
+                {name: list(running(months)) for name, months in sorted(groups.items())},
+                Column(name="month", typecode="i"),
+                *(Column(name=name, typecode="q") for name in COLUMNS[1:]),
+            )
+            for dimension, groups in monthly.items()
+        }
+
+        return cls(version, tables, {normalise(name): name for name in fields.values()})
+
+    def find(self, dimension: str, name: str) -> str | None:
+        key = normalise(name)
+
+        return key if key in self.tables[dimension] else None
+
+    def name(self, dimension: str, key: str) -> str:
+        return self.names.get(key, key) if dimension == "field" else key
+
+    def months(
+        self, dimension: str, key: str, since: int | None = None, until: int | None = None
+    ) -> list[tuple[t.Any, ...]]:
+        """
+        The rows of ``key`` from the month ``since`` up to and including ``until`` (as YYYYMM).
+        """
+        return [
+            row
+            for row in self.tables[dimension].rows(key)
+            if (since is None or row[0] >= since) and (until is None or row[0] <= until)
+        ]
+
+    def records(self, rows: t.Iterable[t.Sequence[t.Any]]) -> list[dict[str, t.Any]]:
+        return [dict(zip(COLUMNS, (month_label(row[0]), *row[1:]))) for row in rows]
+
+    def totals(self, dimension: str, key: str) -> dict[str, t.Any]:
+        """
+        The first and last months ``key`` produced in and its production over all of them.
+        """
+        rows = self.tables[dimension].rows(key)
+        first, last = rows[0], rows[-1]
+
+        return {
+            "name": self.name(dimension, key),
+            "first_month": month_label(first[0]),
+            "last_month": month_label(last[0]),
+            "oil": last[4],
+            "gas": last[5],
+            "water": last[6],
+        }
+
+    def lease_totals(self, number: str) -> tuple[t.Any, ...]:
+        """
+        A lease's production to date for the lease export, or ``N/A`` if none was reported.
+        """
+        table = self.tables["lease"]
+        key = normalise(number)
+
+        if key not in table:
+            return ("N/A", "N/A", "N/A")
+
+        return tuple(column[table.span(key)[1] - 1] for column in table.columns[4:])
+
+    def export_header(self) -> list[str]:
+        return [name.format(since=self.since) for name in EXPORT_HEADER]
+
+    def nbytes(self) -> int:
+        return sum(table.nbytes() for table in self.tables.values())
+
+
+def running(months: t.Mapping[int, t.Sequence[int]]) -> t.Iterator[tuple[int, ...]]:
+    """
+    Each month's production in order, followed by the totals up to and including it.
+    """
+    cumulative: tuple[int, ...] = (0, 0, 0)
+
+    for month in sorted(months):
+        cumulative = tuple(total + value for total, value in zip(cumulative, months[month]))
+
+        yield (month, *months[month], *cumulative)
+
+
+def with_production(
+    rows: t.Iterable[t.Sequence[t.Any]], rollups: Rollups
+) -> t.Iterator[tuple[t.Any, ...]]:
+    """
+    Adds the ``EXPORT_HEADER`` columns to joined export rows (which start with the lease).
+    """
+    for row in rows:
+        yield (*row, *rollups.lease_totals(row[0]))
+
+
+class Production:
+    """
+    Keeps the production archives (any closed ``years`` given, and the current year) and the
+    field list up to date, and the rollups built from them. The rollups are saved to storage
+    under the snapshot keys of every archive, so they are only rolled up again once one of
+    those has changed.
+
+    A closed year that fails is left out (and logged) for ``MISSING_RETRY`` seconds rather than
+    failing the rollups; the current year and the field list are always needed.
+    """
+
+    def __init__(self, years: t.Iterable[int] = (), workers: int = 5) -> None:
+        self.fields = FieldData()
+        self.archives = [*(ProductionData(year) for year in sorted(years)), ProductionData()]
+        self.workers = workers
+
+        # When each closed year left out last failed
+        self.missing: dict[int, float] = dict()
+
+        self.rollups: Rollups | None = None
+        self.builds = lease.SingleFlight()
+
+    def datasets(self) -> tuple[lease.ZipData, ...]:
+        return (self.fields, *self.available())
+
+    def available(self) -> list[ProductionData]:
+        now = monotonic()
+
+        return [
+            archive
+            for archive in self.archives
+            if archive.year is None or now - self.missing.get(archive.year, -inf) >= MISSING_RETRY
+        ]
+
+    def leave_out(self, year: int, error: BaseException) -> None:
+        self.missing[year] = monotonic()
+
+        metrics.logger.warning(
+            json.dumps({"event": "production_year_left_out", "year": year, "error": str(error)})
+        )
+
+    def data_version(self, check: bool = True) -> str:
+        if check:
+            self.fields.cache()
+
+            for archive in self.available():
+                try:
+                    archive.cache()
+
+                except lease.WebLeaseException as error:
+                    if archive.year is None:
+                        raise
+
+                    self.leave_out(archive.year, error)
+
+        keys = "\n".join([dataset.snapshot_key() for dataset in self.datasets()])
+
+        return hashlib.sha256(f"{ROLLUP_VERSION}\n{keys}".encode()).hexdigest()
+
+    def current(self, timeout: float | None = None) -> Rollups:
+        """
+        Returns the rollups for the current version of the data, building them first if need
+        be. As with the lease export, a caller that has waited ``timeout`` seconds gets the
+        previous rollups while there are any, and ``BuildTimeout`` otherwise.
+        """
+        version = self.data_version()
+
+        if self.rollups is not None and self.rollups.version == version:
+            return self.rollups
+
+        try:
+            return self.builds.run(f"production-{version}", lambda: self.build(version), timeout)
+
+        except lease.BuildTimeout:
+            if self.rollups is None:
+                raise
+
+            return self.rollups
+
+    def build(self, version: str) -> Rollups:
+        with storage.lock("production"):
+            rollups = self.load(version)
+
+            if rollups is None:
+                self.prepare_data()
+
+                # Without any closed year that could not be fetched, which may have been rolled
+                # up before
+                version = self.data_version(check=False)
+                rollups = self.load(version)
+
+            if rollups is None:
+                with metrics.stage("Production", "rollup") as info:
+                    rollups = Rollups.build(
+                        version,
+                        archives=[archive.parsed_data for archive in self.available()],
+                        fields=self.fields.parsed_data,
+                    )
+                    info["rows"] = sum(len(table.columns[0]) for table in rollups.tables.values())
+
+                with metrics.stage("Production", "snapshot_save"):
+                    storage.save_snapshot(SNAPSHOT, version, rollups)
+
+        self.rollups = rollups
+
+        return rollups
+
+    def load(self, version: str) -> Rollups | None:
+        with metrics.stage("Production", "snapshot_load") as info:
+            rollups = storage.load_snapshot(SNAPSHOT, version)
+            info["cache"] = "miss" if rollups is None else "hit"
+
+        return t.cast(Rollups | None, rollups)
+
+    def prepare_data(self) -> None:
+        with metrics.stage("Production", "prepare_data"):
+            with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+                futures = {executor.submit(dataset.prepare): dataset for dataset in self.datasets()}
+
+                for future, dataset in futures.items():
+                    error = future.exception()
+
+                    if error is None:
+                        continue
+
+                    if not isinstance(dataset, ProductionData) or dataset.year is None:
+                        raise error
+
+                    self.leave_out(dataset.year, error)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import mmap
+import fcntl
+import pickle
+import typing as t
+import tempfile
+from contextlib import suppress, contextmanager
+
+STORAGE = "storage"
+
+# Bump whenever the layout of the snapshot files changes.
+SNAPSHOT_FORMAT = 2
+
+# The raw buffers of a snapshot start on multiples of this, so each can be cast in place.
+ALIGNMENT = 8
+
+
+def path(name: str) -> str:
+    return os.path.join(STORAGE, name)
+
+
+@contextmanager
+def atomic_write(name: str, mode: str = "wb") -> t.Iterator[t.IO[t.Any]]:
+    """
+    Writes to a temporary file next to ``name`` and only renames it into place once the write
+    has finished, so no other worker can ever see a partially written file.
+    """
+    os.makedirs(STORAGE, exist_ok=True)
+
+    descriptor, temporary = tempfile.mkstemp(dir=STORAGE, prefix=f".{name}.", suffix=".tmp")
+
+    try:
+        with os.fdopen(descriptor, mode) as save_file:
+            yield save_file
+
+            save_file.flush()
+            os.fsync(save_file.fileno())
+
+        os.replace(temporary, path(name))
+
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+@contextmanager
+def lock(name: str) -> t.Iterator[None]:
+    """
+    Holds an exclusive lock on ``name`` across every thread and process sharing the storage
+    directory, so only one of them refreshes a given file at a time.
+    """
+    os.makedirs(STORAGE, exist_ok=True)
+
+    with open(file=path(f"{name}.lock"), mode="a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        try:
+            yield
+
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_snapshot(name: str, key: str, data: t.Any) -> None:
+    """
+    Saves ``data`` under ``name`` with ``key``. The buffers ``data`` hands over out of band (the
+    typed arrays of a columnar Table) are written raw after the pickle, each on an ``ALIGNMENT``
+    boundary, so loading the snapshot can map them back in place instead of copying them.
+    """
+    buffers: list[pickle.PickleBuffer] = list()
+    payload = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL, buffer_callback=buffers.append)
+    raws = [buffer.raw() for buffer in buffers]
+
+    with atomic_write(name) as snapshot_file:
+        pickle.dump((SNAPSHOT_FORMAT, key), snapshot_file, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(
+            (len(payload), [raw.nbytes for raw in raws]),
+            snapshot_file,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+        snapshot_file.write(payload)
+
+        for raw in raws:
+            snapshot_file.write(bytes(-snapshot_file.tell() % ALIGNMENT))
+            snapshot_file.write(raw)
+
+
+def load_snapshot(name: str, key: str) -> t.Any:
+    """
+    Returns the data saved under ``name`` if it was saved with the same ``key``, otherwise
+    ``None``. The file is memory mapped read-only and the raw buffers are handed back as views
+    of it, so the typed columns of every worker loading the same snapshot share the same pages
+    of the page cache. Everything else in the pickle (dicts, the string dictionaries of the
+    columns and the key index of a Table) is still a private copy in each worker.
+    """
+    try:
+        with open(file=path(name), mode="rb") as snapshot_file:
+            # Left open for as long as any of the views of it are in use
+            mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(mapped)
+
+    # Every view taken of the mapping, released again if nothing is loaded from it
+    views = [view]
+    data = None
+
+    try:
+        if pickle.load(mapped) != (SNAPSHOT_FORMAT, key):
+            return None
+
+        length, sizes = pickle.load(mapped)
+
+        start = mapped.tell()
+        buffers = list()
+        offset = start + length
+
+        for size in sizes:
+            offset += -offset % ALIGNMENT
+            buffers.append(view[offset : offset + size])
+            offset += size
+
+        payload = view[start : start + length]
+        views += [*buffers, payload]
+
+        data = pickle.loads(payload, buffers=buffers)
+
+        return data
+
+    except (EOFError, pickle.UnpicklingError, AttributeError, ValueError):
+        return None
+
+    finally:
+        # Any views still held by what was unpickled before an error keep the mapping open
+        # until they are gone.
+        if data is None:
+            for each in reversed(views):
+                each.release()
+
+            with suppress(BufferError):
+                mapped.close()
@@ -0,0 +1,46 @@
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timezone, timedelta
+from unittest import mock
+
+import delta
+import storage
+
+
+class ResolveTest(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        patcher = mock.patch.object(storage, "STORAGE", directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        delta.save("first", dict())
+
+    def test_version(self) -> None:
+        self.assertEqual(delta.resolve("first"), "first")
+        self.assertIsNone(delta.resolve("unknown"))
+
+    def test_local_time(self) -> None:
+        later = datetime.now() + timedelta(minutes=1)
+        earlier = datetime.now() - timedelta(minutes=1)
+
+        self.assertEqual(delta.resolve(later.isoformat()), "first")
+        self.assertIsNone(delta.resolve(earlier.isoformat()))
+
+    def test_time_with_offset(self) -> None:
+        later = datetime.now(timezone.utc) + timedelta(minutes=1)
+        earlier = datetime.now(timezone.utc) - timedelta(minutes=1)
+
+        self.assertEqual(delta.resolve(later.isoformat()), "first")
+        self.assertEqual(delta.resolve(later.isoformat().replace("+00:00", "Z")), "first")
+        self.assertEqual(
+            delta.resolve(later.astimezone(timezone(timedelta(hours=-5))).isoformat()), "first"
+        )
+        self.assertIsNone(delta.resolve(earlier.isoformat().replace("+00:00", "Z")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,146 @@
+import os
+import json
+import shutil
+import typing as t
+import zipfile
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import lease
+import storage
+from benchmarks.server import StandInServer
+
+
+class Archive(lease.ZipData):
+    def parse_data(self) -> None:
+        self.parsed_data = list(self.lines())
+
+
+class DownloadTest(unittest.TestCase):
+    """
+    Downloads and revalidates an archive served by the benchmark stand-in, which answers
+    ``If-Modified-Since`` with a 304 and resumes with a 206 for a ``Range`` request.
+    """
+
+    def setUp(self) -> None:
+        self.site = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.site)
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        for patcher in (
+            mock.patch.object(storage, "STORAGE", directory),
+            mock.patch.object(lease, "HTTP_BACKOFF", 0),
+            mock.patch.object(lease, "urlopen", self.urlopen),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        server = StandInServer(site=self.site)
+        server.__enter__()
+        self.addCleanup(server.__exit__)
+
+        self.statuses: list[int] = list()
+        self.publish(b"first", modified=datetime(2024, 1, 1))
+
+        self.dataset = Archive(url=server.url("/data/test.zip"), filepath="data/test.txt")
+        self.dataset.update = "01/01/2024 12:00:00 AM"
+
+    def urlopen(self, *args: t.Any, **kwargs: t.Any) -> t.Any:
+        try:
+            response = urlopen(*args, **kwargs)
+
+        except HTTPError as error:
+            self.statuses.append(error.code)
+            raise
+
+        self.statuses.append(response.status)
+
+        return response
+
+    def publish(self, content: bytes, modified: datetime) -> None:
+        os.makedirs(os.path.join(self.site, "data"), exist_ok=True)
+        self.archive = os.path.join(self.site, "data", "test.zip")
+
+        with zipfile.ZipFile(self.archive, mode="w") as archive:
+            # Stored rather than deflated, so the archive is big enough to be cut short
+            archive.writestr("data/test.txt", content * 4096)
+
+        os.utime(self.archive, (modified.timestamp(), modified.timestamp()))
+
+    def part(self) -> bytes:
+        with open(storage.path("test.txt.part"), mode="rb") as part_file:
+            return part_file.read()
+
+    def published(self) -> bytes:
+        with open(self.archive, mode="rb") as archive:
+            return archive.read()
+
+    def test_download(self) -> None:
+        self.assertTrue(self.dataset.download())
+        self.assertEqual(self.statuses, [200])
+        self.assertEqual(self.part(), self.published())
+
+        with open(storage.path("test.txt.part.http"), mode="r") as validator_file:
+            self.assertIsNotNone(json.load(validator_file)["last_modified"])
+
+    def test_not_modified(self) -> None:
+        self.dataset.get_remote_data()
+        self.dataset.parsed_data = ["parsed"]
+        self.dataset.save_snapshot()
+
+        self.dataset.update = "01/02/2024 12:00:00 AM"
+        self.dataset.get_remote_data()
+
+        self.assertEqual(self.statuses, [200, 304])
+
+        with open(storage.path("test.txt.time"), mode="r") as time_file:
+            self.assertEqual(time_file.read(), "01/02/2024 12:00:00 AM")
+
+        # The snapshot is carried over to the new stamp instead of being parsed again
+        self.assertEqual(
+            storage.load_snapshot("test.txt.snapshot", self.dataset.snapshot_key()), ["parsed"]
+        )
+
+    def test_modified(self) -> None:
+        self.dataset.get_remote_data()
+        self.publish(b"second", modified=datetime(2024, 1, 2))
+
+        self.assertTrue(self.dataset.download())
+        self.assertEqual(self.statuses, [200, 200])
+        self.assertEqual(self.part(), self.published())
+
+    def test_resume(self) -> None:
+        self.dataset.download()
+        os.truncate(storage.path("test.txt.part"), os.path.getsize(self.archive) // 2)
+
+        self.assertTrue(self.dataset.download())
+        self.assertEqual(self.statuses, [200, 206])
+        self.assertEqual(self.part(), self.published())
+
+    def test_resume_changed(self) -> None:
+        self.dataset.download()
+        os.truncate(storage.path("test.txt.part"), os.path.getsize(self.archive) // 2)
+        self.publish(b"second", modified=datetime(2024, 1, 1) + timedelta(days=1))
+
+        # The If-Range date no longer matches, so the whole new archive is sent instead
+        self.assertTrue(self.dataset.download())
+        self.assertEqual(self.statuses, [200, 200])
+        self.assertEqual(self.part(), self.published())
+
+    def test_resume_complete(self) -> None:
+        self.dataset.download()
+
+        # Nothing is left to resume from the end of the archive, so it is fetched again
+        self.assertTrue(self.dataset.download())
+        self.assertEqual(self.statuses, [200, 416, 200])
+        self.assertEqual(self.part(), self.published())
+
+
+if __name__ == "__main__":
+    unittest.main()
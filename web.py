@@ -1,22 +1,109 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from datetime import datetime
+import os
+import json
+import pstats
+import typing as t
+import logging
+import cProfile
+from datetime import date, datetime
+from functools import wraps
 
-from flask import Flask, Response, send_file, render_template
+from flask import Flask, Response, abort, jsonify, request, send_file, render_template
 
 import lease
+import exports
+import metrics
+import storage
+import production
 
 app = Flask(__name__)
 
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# How long a request waits on a build before it is served the previous data (or a 503).
+BUILD_TIMEOUT = 30
+
+# With this set, ``profile=1`` on a download profiles it and saves the profile to storage.
+PROFILING = os.environ.get("WEBLEASE_PROFILING") == "1"
+PROFILE_ENTRIES = 20
+
+if not metrics.logger.handlers:
+    metrics.logger.addHandler(logging.StreamHandler())
+    metrics.logger.setLevel(os.environ.get("WEBLEASE_LOG_LEVEL", "INFO"))
+
 owner = lease.OwnerData()
 area_block = lease.LabData()
-lease_data = lease.LeaseData()
+lease_data = lease.LeaseData(calendar_terms=os.environ.get("WEBLEASE_CALENDAR_TERMS") == "1")
 companies = lease.CompanyNumberToName()
 lease_operators = lease.LeaseNumberToOperator()
 
 w = lease.WebLeaseWrapper(owner, area_block, lease_data, companies, lease_operators)
 
+# The closed years to roll production up from besides the current one, e.g. "2015-2018"; every
+# closed year unless any are given.
+production_data = production.Production(
+    years=production.parse_years(os.environ.get("WEBLEASE_PRODUCTION_YEARS", ""))
+)
+
+refresher = lease.Refresher(w, tasks={"production": production_data.current})
+
+# The plural names the production endpoints use for each dimension.
+PRODUCTION_DIMENSIONS = {f"{dimension}s": dimension for dimension in production.DIMENSIONS}
+
+if os.environ.get("WEBLEASE_BACKGROUND_REFRESH", "1") != "0":
+    refresher.start()
+
+
+def export_filename(extension: str = "csv") -> str:
+    return f"output_{datetime.now().strftime('%Y%m%d%H%m')}.{extension}"
+
+
+def profiled(view: t.Callable[..., Response]) -> t.Callable[..., Response]:
+    """
+    Runs ``view`` under cProfile when profiling is enabled and the request asks for it with
+    ``profile=1``, saves the profile to storage (named in the ``X-Profile`` header, for
+    ``pstats`` or snakeviz) and logs its most expensive calls. A streamed response is only
+    profiled up to the point it starts streaming.
+    """
+
+    @wraps(view)
+    def wrapper(*args: t.Any, **kwargs: t.Any) -> Response:
+        if not PROFILING or not request.args.get("profile", type=int):
+            return view(*args, **kwargs)
+
+        profile = cProfile.Profile()
+        response = profile.runcall(view, *args, **kwargs)
+
+        name = f"profile-{datetime.now().strftime('%Y%m%d%H%M%S%f')}.prof"
+        profile.dump_stats(storage.path(name))
+
+        # Each entry is (calls, primitive calls, own time, cumulative time, callers)
+        entries = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+        top = sorted(entries.items(), key=lambda item: item[1][3], reverse=True)
+
+        metrics.logger.info(
+            json.dumps(
+                {
+                    "event": "profile",
+                    "path": request.full_path,
+                    "profile": name,
+                    "top": [
+                        {"function": f"{file}:{line}({function})", "seconds": entry[3]}
+                        for (file, line, function), entry in top[:PROFILE_ENTRIES]
+                    ],
+                }
+            )
+        )
+
+        response.headers.set("X-Profile", name)
+
+        return response
+
+    return wrapper
+
 
 @app.route("/")
 def home() -> str:
@@ -25,37 +112,374 @@ def home() -> str:
 
 @app.route("/format")
 def static_page() -> str:
-    w.owner.cache()
-    w.area_block.cache()
-    w.lease_data.cache()
-    w.lease_operators.cache()
-    w.companies.cache()
+    if refresher.running:
+        refresher.export(timeout=BUILD_TIMEOUT)
+
+    else:
+        w.owner.cache()
+        w.area_block.cache()
+        w.lease_data.cache()
+        w.lease_operators.cache()
+        w.companies.cache()
 
     return render_template(
         "format.html",
         owner_url=w.owner.url,
-        owner_date=w.owner.update,
+        owner_date=update_stamp(w.owner),
         area_block_url=w.area_block.url,
-        area_block_date=w.area_block.update,
+        area_block_date=update_stamp(w.area_block),
         lease_data_url=w.lease_data.url,
-        lease_data_date=w.lease_data.update,
+        lease_data_date=update_stamp(w.lease_data),
     )
 
 
+def update_stamp(dataset: lease.ZipData) -> str:
+    """
+    A dataset the refresher has not yet managed to fetch has no update stamp to show.
+    """
+    return str(getattr(dataset, "update", "unknown"))
+
+
 @app.route("/download")
+@profiled
 def download() -> Response:
-    w.prepare_data()
-    w.prepare_csv_list()
+    name = request.args.get("format", "csv")
+
+    if name not in exports.FORMATS:
+        abort(400, description=f"Unknown format; use one of {', '.join(exports.FORMATS)}.")
+
+    export_format = exports.FORMATS[name]
+
+    # Only the text formats are worth compressing; XLSX is a zip archive already.
+    compressed = request.accept_encodings["gzip"] > 0 and name in ("csv", "ndjson")
+
+    # The production columns change with the production data, so they are never cached.
+    if request.args.get("stream", type=int) or request.args.get("production", type=int):
+        return stream_download(
+            export_format=export_format,
+            compressed=compressed,
+            with_production=bool(request.args.get("production", type=int)),
+        )
+
+    export = current_export()
+
+    if name != "csv":
+        compressed = False
 
-    file = w.send_csv()
+        try:
+            export = w.formatted_export(export, name=name, timeout=BUILD_TIMEOUT)
 
-    return send_file(
-        file,
+        except lease.BuildTimeout:
+            abort(503, description="The lease data is still being prepared; try again shortly.")
+
+    response = send_file(
+        export.path(compressed=compressed, extension=export_format.extension),
+        mimetype=export_format.mimetype,
         as_attachment=True,
-        download_name=f"output_{datetime.now().strftime('%Y%m%d%H%m')}.csv",
+        download_name=export_filename(extension=export_format.extension),
+        etag=export.etag(compressed=compressed, extension=export_format.extension),
+        conditional=True,
+    )
+    response.vary.add("Accept-Encoding")
+    response.headers.set("X-Data-Version", export.version)
+
+    if compressed:
+        response.content_encoding = "gzip"
+
+    return response
+
+
+def current_export() -> lease.CachedExport:
+    if refresher.running:
+        export = refresher.export(timeout=BUILD_TIMEOUT)
+
+        if export is None:
+            abort(503, description="The lease data has not been prepared yet.")
+
+        return export
+
+    try:
+        return w.export(timeout=BUILD_TIMEOUT)
+
+    except lease.BuildTimeout:
+        abort(503, description="The lease data is still being prepared; try again shortly.")
+
+
+def stream_download(
+    export_format: exports.ExportFormat, compressed: bool, with_production: bool = False
+) -> Response:
+    index = lease_index()
+
+    if with_production:
+        rollups = production_rollups()
+
+        chunks = w.iter_export(
+            name=export_format.name,
+            rows=production.with_production(index.rows(), rollups),
+            compress=compressed,
+            header=[*w.header_row, *rollups.export_header()],
+            types=[*w.column_types, *production.EXPORT_TYPES],
+        )
+
+    else:
+        chunks = w.iter_export(name=export_format.name, rows=index.rows(), compress=compressed)
+
+    response = Response(chunks, mimetype=export_format.mimetype)
+    response.vary.add("Accept-Encoding")
+    response.headers.set(
+        "Content-Disposition",
+        "attachment",
+        filename=export_filename(extension=export_format.extension),
+    )
+
+    if compressed:
+        response.content_encoding = "gzip"
+
+    return response
+
+
+def lease_index() -> lease.LeaseIndex:
+    if refresher.running:
+        if refresher.export(timeout=BUILD_TIMEOUT) is None or w.lease_query is None:
+            abort(503, description="The lease data has not been prepared yet.")
+
+        return w.lease_query
+
+    try:
+        return w.leases(timeout=BUILD_TIMEOUT)
+
+    except lease.BuildTimeout:
+        abort(503, description="The lease data is still being prepared; try again shortly.")
+
+
+def lease_response(index: lease.LeaseIndex, leases: list[str], **extra: t.Any) -> Response:
+    if request.args.get("format", "json") == "csv":
+        rows = (row for number in leases for row in index.leases[number])
+
+        return Response(w.iter_csv(rows=rows), mimetype="text/csv")
+
+    return jsonify(
+        version=index.version,
+        **extra,
+        leases=[{"lease": number, "rows": index.records(number)} for number in leases],
+    )
+
+
+@app.route("/leases/<lease_number>")
+def lease_lookup(lease_number: str) -> Response:
+    index = lease_index()
+    number = lease_number.strip().upper()
+
+    if number not in index.leases:
+        abort(404, description=f"Lease {lease_number} was not found.")
+
+    return lease_response(index, [number])
+
+
+def page() -> tuple[int, int]:
+    """
+    The ``offset`` and ``limit`` of a paginated request, kept within bounds.
+    """
+    offset = max(request.args.get("offset", default=0, type=int), 0)
+    limit = min(max(request.args.get("limit", default=PAGE_SIZE, type=int), 1), MAX_PAGE_SIZE)
+
+    return offset, limit
+
+
+@app.route("/leases")
+def lease_search() -> Response:
+    """
+    Filters the leases by ``operator``, ``owner`` (the primary owner), ``area_code``,
+    ``block_num``, ``status`` and an ``expires_after``/``expires_before`` range of ISO dates. JSON
+    results are paginated with ``offset`` and ``limit``; CSV results are streamed in full unless
+    either of them is given.
+    """
+    try:
+        expires_after, expires_before = (
+            None if value is None else date.fromisoformat(value)
+            for value in (request.args.get("expires_after"), request.args.get("expires_before"))
+        )
+
+    except ValueError:
+        abort(400, description="Expiration dates must be given as YYYY-MM-DD.")
+
+    index = lease_index()
+
+    leases = index.query(
+        operator=request.args.get("operator"),
+        owner=request.args.get("owner"),
+        area_code=request.args.get("area_code"),
+        block_number=request.args.get("block_num"),
+        status=request.args.get("status"),
+        expires_after=expires_after,
+        expires_before=expires_before,
+    )
+
+    offset, limit = page()
+
+    if request.args.get("format") == "csv" and not {"offset", "limit"} & set(request.args):
+        return lease_response(index, leases)
+
+    return lease_response(
+        index, leases[offset : offset + limit], total=len(leases), offset=offset, limit=limit
+    )
+
+
+def production_rollups() -> production.Rollups:
+    if refresher.running:
+        if production_data.rollups is None:
+            abort(503, description="The production data has not been prepared yet.")
+
+        return production_data.rollups
+
+    try:
+        return production_data.current(timeout=BUILD_TIMEOUT)
+
+    except lease.BuildTimeout:
+        abort(503, description="The production data is still being prepared; try again shortly.")
+
+
+def production_dimension(dimension: str) -> str:
+    if dimension not in PRODUCTION_DIMENSIONS:
+        abort(404, description=f"Use one of {', '.join(PRODUCTION_DIMENSIONS)}.")
+
+    return PRODUCTION_DIMENSIONS[dimension]
+
+
+def csv_response(header: t.Sequence[str], rows: t.Iterable[t.Sequence[t.Any]]) -> Response:
+    return Response(
+        exports.FORMATS["csv"].write(header=header, types=["str"] * len(header), rows=rows),
         mimetype="text/csv",
     )
 
 
+@app.route("/production/<dimension>")
+def production_search(dimension: str) -> Response:
+    """
+    Every field, block or lease that has produced, with its first and last months and its
+    cumulative oil, gas and water; JSON results are paginated with ``offset`` and ``limit``.
+    """
+    kind = production_dimension(dimension)
+    rollups = production_rollups()
+    keys = list(rollups.tables[kind])
+
+    if request.args.get("format") == "csv":
+        summaries = (rollups.totals(kind, key) for key in keys)
+        header = ["name", "first_month", "last_month", "oil", "gas", "water"]
+
+        return csv_response(header, ([summary[name] for name in header] for summary in summaries))
+
+    offset, limit = page()
+
+    return jsonify(
+        version=rollups.version,
+        since=rollups.since,
+        total=len(keys),
+        offset=offset,
+        limit=limit,
+        **{dimension: [rollups.totals(kind, key) for key in keys[offset : offset + limit]]},
+    )
+
+
+@app.route("/production/<dimension>/<name>")
+def production_lookup(dimension: str, name: str) -> Response:
+    """
+    The monthly and cumulative production of one field, block (as in the ``BlockNum`` column
+    of the export) or lease, optionally only from the month ``since`` up to and including the
+    month ``until``, both given as YYYY-MM.
+    """
+    kind = production_dimension(dimension)
+
+    try:
+        since, until = (
+            None if value is None else production.month_number(value)
+            for value in (request.args.get("since"), request.args.get("until"))
+        )
+
+    except ValueError:
+        abort(400, description="Months must be given as YYYY-MM.")
+
+    rollups = production_rollups()
+    key = rollups.find(kind, name)
+
+    if key is None:
+        abort(404, description=f"No production was found for {kind} {name}.")
+
+    months = rollups.months(kind, key, since=since, until=until)
+
+    if request.args.get("format") == "csv":
+        return csv_response(
+            production.COLUMNS, (list(record.values()) for record in rollups.records(months))
+        )
+
+    return jsonify(
+        version=rollups.version,
+        since=rollups.since,
+        totals=rollups.totals(kind, key),
+        months=rollups.records(months),
+    )
+
+
+@app.route("/delta")
+def delta_download() -> Response:
+    """
+    The rows added, changed and removed since the version given as ``since`` (as returned in
+    the ``X-Data-Version`` header of an earlier response) or since an ISO 8601 point in time,
+    as CSV or, with ``format=ndjson``, newline-delimited JSON.
+    """
+    since = request.args.get("since")
+
+    if since is None:
+        abort(400, description="Give the version or time to export the changes since.")
+
+    index = lease_index()
+    changes = w.changes(since=since, version=index.version)
+
+    if changes is None:
+        abort(410, description=f"Version {since} is no longer kept; download the full export.")
+
+    if request.args.get("format") == "ndjson":
+        body = (
+            json.dumps({"change": change, **dict(zip(index.header, row))}) + "\n"
+            for change, row in changes
+        )
+        response = Response(body, mimetype="application/x-ndjson")
+
+    else:
+        response = Response(
+            w.iter_csv(
+                rows=((change, *row) for change, row in changes),
+                header=["Change", *index.header],
+            ),
+            mimetype="text/csv",
+        )
+
+    response.headers.set("X-Data-Version", index.version)
+
+    return response
+
+
+@app.route("/metrics")
+def metrics_page() -> Response:
+    """
+    The timings, sizes, row counts and cache results of every stage so far, in the Prometheus
+    text exposition format.
+    """
+    return Response(metrics.registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/status")
+def status() -> Response:
+    return jsonify(
+        running=refresher.running,
+        version=None if w.cached_export is None else w.cached_export.version,
+        datasets=refresher.status,
+        export_error=refresher.export_error,
+        production=None if production_data.rollups is None else production_data.rollups.version,
+        production_missing=sorted(production_data.missing),
+        memory=w.memory_report(),
+    )
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0")